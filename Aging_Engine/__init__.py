@@ -0,0 +1,53 @@
+import importlib
+
+# Package front end of the flat modules next to it. Importing it loads nothing else: each name
+# below imports its module on first use (PEP 562), so `from Aging_Engine import k_all` costs numpy
+# and Aging_Model only, and pandas / matplotlib / scipy are loaded by the functions that need them.
+# The flat modules import each other by name and are installed next to the package
+# (pip install -e . from the repository root, see pyproject.toml), which makes them importable from
+# any directory and in worker processes. Without installing, run from the repository root or add it
+# to PYTHONPATH; the package does not change sys.path itself.
+_EXPORTS = {
+    'Aging_Model': ('PARAMETER_NAMES', 'get_parameters', 'parameter_overrides', 'k_all', 'k_all_scalar'),
+    'Cycle_Engine': ('INTEGRATORS', 'CycleData', 'CycleProfile', 'fast_forward', 'run_cycles'),
+    'Closed_Loop': ('run_closed_loop',),
+    'Temperature_Sweep': ('sweep_temperatures',),
+    'End_Of_Life': ('cycles_to_threshold',),
+    'Fleet_Batch': ('pack_profiles', 'evaluate_fleet'),
+    'Scenario_Grid': ('build_grid', 'run_grid'),
+    'Scenario_Runner': ('ResultCache', 'load_study', 'run_study'),
+    'Online_Estimator': ('OnlineAgingEstimator',),
+    'Rate_Surface': ('ProfileRates', 'cached_rate_grid'),
+    'Profile_Cache': ('load_arrays', 'load_profile', 'profile_hash'),
+    'Profile_Compression': ('compress_profile',),
+    'Calc_SOC': ('CoulombCounter', 'build_CRDR'),
+    'OCV_Table': ('OCVTable', 'load_table'),
+    'Calibration': ('FadeMeasurement', 'calibrate'),
+    'Monte_Carlo': ('draw_parameters', 'propagate'),
+    'Result_Export': ('LossExporter', 'read_columns'),
+    'Checkpoint': ('Checkpointer', 'state_key'),
+    'Engine_Profiling': ('StageProfiler', 'ProgressReporter'),
+    'Plot_Decimation': ('plot_decimated',),
+}
+_MODULE_OF = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = sorted(_MODULE_OF)
+
+
+def __getattr__(name):
+    if name not in _MODULE_OF:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = _MODULE_OF[name]
+    try:
+        value = getattr(importlib.import_module(module), name)
+    except ModuleNotFoundError as error:
+        if error.name != module:
+            raise
+        raise ModuleNotFoundError(f"Aging_Engine.{name} needs the engine modules: pip install -e . in the repository "
+                                  f"root, or run from it / set PYTHONPATH (no module {module!r})", name=module) from error
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
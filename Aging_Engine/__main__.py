@@ -0,0 +1,221 @@
+import argparse
+import os
+import sys
+import time as tm
+
+import numpy as np
+
+from Cycle_Engine import INTEGRATORS, fast_forward, run_cycles
+from Cycle_Results import LOSS_KEYS
+from Profile_Cache import load_profile
+
+MODES = ('sweep', 'fast_forward', 'loop', 'closed_loop')
+# modes that run cycle by cycle and so report progress and can checkpoint
+LOOP_MODES = ('loop', 'closed_loop')
+
+
+# Installed (pip install -e .) as the aging-engine command; otherwise run from the repository root:
+# python -m Aging_Engine run --profile CRDR.csv --temperature 0 25 45 --cycles 3000
+# python -m Aging_Engine eol --profile CRDR.csv --temperature 25 --threshold 0.8
+# python -m Aging_Engine study scenarios.toml --cache-dir results --output study.npz
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m Aging_Engine', description='Battery aging simulations',
+                                     epilog='Install with pip install -e . (aging-engine command), or run from the repository root.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_profile_options(command):
+        command.add_argument('--profile', required=True, help='cycle CSV (CRDR layout); a binary sidecar is cached next to it')
+        command.add_argument('--temperature', type=float, nargs='+', default=[25.0], help='temperatures in °C')
+        command.add_argument('--integrator', choices=INTEGRATORS, default='trapz')
+        command.add_argument('--compress', type=float, default=None, metavar='TOLERANCE',
+                             help='merge near-constant samples, losses over the run within TOLERANCE relative')
+
+    run = commands.add_parser('run', help='per-cycle losses over a number of cycles')
+    add_profile_options(run)
+    run.add_argument('--cycles', type=int, default=1000)
+    run.add_argument('--mode', choices=MODES, default='sweep')
+    run.add_argument('--keep-every', type=int, default=None, help='loop / closed_loop: keep every Nth trajectory')
+    run.add_argument('--export', default=None, metavar='PATH', help='append the per-cycle losses (.parquet, .h5 or a directory)')
+    run.add_argument('--scenario', default=None, help='scenario id of the exported rows (default: the profile name)')
+    run.add_argument('--checkpoint-dir', default=None, help='loop / closed_loop: save and resume checkpoints there')
+    run.add_argument('--checkpoint-every', type=int, default=1000, help='cycles between checkpoints')
+    run.add_argument('--checkpoint-seconds', type=float, default=300, help='and at least this many seconds')
+    run.add_argument('--output', default=None, metavar='NPZ', help='save the cumulative losses (temperature x cycle)')
+    run.add_argument('--plot', nargs='?', const='', default=None, metavar='FILE',
+                     help='plot the cumulative losses (shown, or saved to FILE)')
+    run.add_argument('--profile-stages', action='store_true', help='report the time per engine stage')
+    run.add_argument('--progress-interval', type=float, default=5.0, help='seconds between progress lines')
+    run.set_defaults(handler=run_command)
+
+    eol = commands.add_parser('eol', help='cycles until capacity retention drops to a threshold')
+    add_profile_options(eol)
+    eol.add_argument('--threshold', type=float, default=0.8, help='capacity retention (0.8 = 80 %%)')
+    eol.add_argument('--max-cycles', type=int, default=10 ** 7)
+    eol.set_defaults(handler=eol_command)
+
+    study = commands.add_parser('study', help='run a scenario file (JSON / TOML), reusing cached results')
+    study.add_argument('study', help='scenario file, see Scenario_Runner.load_study')
+    study.add_argument('--cache-dir', default=None, help='result cache directory (default: .scenario_cache next to the code)')
+    study.add_argument('--max-bytes', type=float, default=None, help='cache size limit in bytes (default: 1 GiB)')
+    study.add_argument('--workers', type=int, default=None, help='worker processes (1: in-process)')
+    study.add_argument('--output', default=None, metavar='NPZ', help='save the cumulative total loss per scenario')
+    study.set_defaults(handler=study_command)
+    return parser
+
+
+def _load(args, temperatures, num_cycles):
+    time, current, SOC = load_profile(args.profile)
+    if args.compress:
+        from Profile_Compression import compress_profile
+        (time, current, SOC), report = compress_profile(time, current, SOC, args.compress, temperatures, args.integrator,
+                                                        num_cycles=num_cycles)
+        print(f"Profile compressed {report['samples']} -> {report['compressed_samples']} samples "
+              f"({report['ratio']:.1f}x, loss error {report['error']:.1e})")
+    return time, current, SOC
+
+
+# One temperature of fast_forward or the cycle-by-cycle modes; only the latter report progress and
+# checkpoint
+def _simulate(args, time, current, SOC, temp, profiler):
+    if args.mode == 'fast_forward':
+        return fast_forward(time, current, temp, SOC, args.cycles, profiler=profiler, integrator=args.integrator)
+
+    from Engine_Profiling import ProgressReporter
+    checkpoint = None
+    if args.checkpoint_dir:
+        from Checkpoint import Checkpointer
+        checkpoint = Checkpointer(os.path.join(args.checkpoint_dir, f'{args.mode}_{temp:.2f}K.npz'),
+                                  args.checkpoint_every, args.checkpoint_seconds)
+    progress = ProgressReporter(args.cycles, args.progress_interval, label=f"{temp - 273.15:.0f}°C cycle")
+    if args.mode == 'closed_loop':
+        from Closed_Loop import run_closed_loop
+        result = run_closed_loop(time, current, temp, SOC, args.cycles, integrator=args.integrator, keep_every=args.keep_every,
+                                 profiler=profiler, progress=progress, checkpoint=checkpoint)
+    else:
+        result = run_cycles(time, current, np.full(len(time), temp), SOC, args.cycles, args.integrator,
+                            keep_every=args.keep_every, profiler=profiler, progress=progress, checkpoint=checkpoint)
+    if checkpoint is not None:
+        report = checkpoint.report()
+        print(f"{temp - 273.15:.0f}°C checkpoints: {report['saves']} saves, {report['seconds']:.2f} s")
+    return result
+
+
+def run_command(args):
+    temperatures = [temp + 273.15 for temp in args.temperature]
+    time, current, SOC = _load(args, temperatures, args.cycles)
+    profiler = None
+    if args.profile_stages:
+        from Engine_Profiling import StageProfiler
+        profiler = StageProfiler()
+
+    start_time = tm.perf_counter()
+    cumulative = {key: np.full((len(temperatures), args.cycles), np.nan) for key in LOSS_KEYS}
+    per_cycle_by_temp = []
+    if args.mode == 'sweep':
+        from Temperature_Sweep import sweep_temperatures
+        rows = sweep_temperatures(time, current, SOC, temperatures, args.cycles, integrator=args.integrator, profiler=profiler)
+        for index, row in enumerate(rows):
+            for key in LOSS_KEYS:
+                cumulative[key][index] = row[key + '_cumulative']
+            per_cycle_by_temp.append({key: row[key] for key in LOSS_KEYS})
+    else:
+        for index, temp in enumerate(temperatures):
+            result = _simulate(args, time, current, SOC, temp, profiler)
+            completed = result.get('completed_cycles', args.cycles)
+            for key in LOSS_KEYS:
+                cumulative[key][index, :completed] = result['cumulative'][key][:completed]
+            per_cycle_by_temp.append({key: result['per_cycle'][key][:completed] for key in LOSS_KEYS})
+    elapsed = tm.perf_counter() - start_time
+
+    for temp, per_cycle in zip(temperatures, per_cycle_by_temp):
+        completed = len(per_cycle['Q_total'])
+        total = float(np.sum(per_cycle['Q_total']))
+        print(f"{temp - 273.15:.1f}°C: {completed} cycles, loss {total * 100:.3f} % "
+              f"(calendar {np.sum(per_cycle['Q_cal']) * 100:.3f} %, cycling {np.sum(per_cycle['Q_cycle']) * 100:.3f} %), "
+              f"retention {(1 - total) * 100:.2f} %")
+    print(f"{args.mode} over {len(temperatures)} temperature(s) x {args.cycles} cycles took {elapsed:.2f} seconds")
+    if profiler is not None:
+        print(profiler.format_report())
+
+    if args.export:
+        from Result_Export import LossExporter
+        scenario = args.scenario or os.path.splitext(os.path.basename(args.profile))[0]
+        with LossExporter(args.export) as exporter:
+            for temp, per_cycle in zip(temperatures, per_cycle_by_temp):
+                exporter.append(scenario, temp, per_cycle)
+        print("Losses exported to:", args.export)
+    if args.output:
+        np.savez(args.output, temperature=np.array(temperatures), cycle=np.arange(1, args.cycles + 1),
+                 **{key + '_cumulative': values for key, values in cumulative.items()})
+        print("Cumulative losses saved to:", args.output)
+    if args.plot is not None:
+        _plot(temperatures, cumulative['Q_total'], args.plot)
+
+
+def _plot(temperatures, cumulative_losses, path):
+    import matplotlib
+    if path:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from Plot_Decimation import plot_decimated
+
+    plt.figure(figsize=(10, 6))
+    cycle_numbers = np.arange(1, cumulative_losses.shape[1] + 1)
+    for temp, losses in zip(temperatures, cumulative_losses):
+        plot_decimated(plt.gca(), cycle_numbers, (1 - losses) * 100, label=f'Temp = {temp - 273.15:.0f}°C')
+    plt.xlabel('Cycle Number')
+    plt.ylabel('Capacity Retention (%)')
+    plt.title('Capacity Retention over cycles for different temperatures')
+    plt.legend()
+    plt.grid(True)
+    if path:
+        plt.savefig(path)
+        print("Plot saved to:", path)
+    else:
+        plt.show()
+
+
+def eol_command(args):
+    from End_Of_Life import cycles_to_threshold
+    temperatures = [temp + 273.15 for temp in args.temperature]
+    profile = _load(args, temperatures, args.max_cycles)
+    cycles = cycles_to_threshold(profile, temperatures, threshold=args.threshold, max_cycles=args.max_cycles,
+                                 integrator=args.integrator)
+    for temp, cycle in zip(temperatures, np.atleast_1d(cycles)):
+        if np.isfinite(cycle):
+            print(f"{temp - 273.15:.1f}°C: capacity reaches {args.threshold * 100:.0f} % at cycle {cycle:.2f}")
+        else:
+            print(f"{temp - 273.15:.1f}°C: capacity stays above {args.threshold * 100:.0f} % for {args.max_cycles} cycles")
+
+
+def study_command(args):
+    import Scenario_Runner
+    results, report = Scenario_Runner.run_study(
+        args.study, cache_dir=args.cache_dir or Scenario_Runner.DEFAULT_CACHE_DIR,
+        max_bytes=Scenario_Runner.DEFAULT_MAX_BYTES if args.max_bytes is None else int(args.max_bytes),
+        max_workers=args.workers)
+    for result in results:
+        scenario = result['scenario']
+        total = float(result['cumulative']['Q_total'][-1])
+        print(f"{scenario['profile']} {scenario['temperature'] - 273.15:.1f}°C x {scenario['num_cycles']} "
+              f"{scenario['engine']}/{scenario['integrator']} {scenario['parameters'] or ''}: loss {total * 100:.3f} %"
+              f"{' (cached)' if result['cached'] else ''}")
+    print(f"{report['scenarios']} scenarios: {report['computed']} computed, {report['cached']} from cache, "
+          f"{report['evicted']} evicted, cache {report['cache_bytes'] / 1e6:.1f} MB, {report['seconds']:.2f} seconds")
+    if args.output:
+        np.savez(args.output, keys=np.array([result['key'] for result in results]),
+                 Q_total=np.array([result['cumulative']['Q_total'][-1] for result in results]))
+        print("Scenario losses saved to:", args.output)
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, 'checkpoint_dir', None) and args.mode not in LOOP_MODES:
+        parser.error(f"--checkpoint-dir needs --mode {' or '.join(LOOP_MODES)}")
+    args.handler(args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,6 @@
+from contextlib import contextmanager
+from math import exp, tanh
 import numpy as np
-import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d import Axes3D
 
 # Constants and Parameters from Table IV
 k_Cal_Ref = 3.69e-4  # h^-0.5
@@ -23,6 +23,30 @@ Rg = 8.314  # J/(mol*K)
 F = 96485  # C/mol (Faraday constant)
 C0 = 1.5  # Ah, nominal cell capacity
 
+# Model parameters that may be overridden per simulation (Rg and F are physical constants)
+PARAMETER_NAMES = ('k_Cal_Ref', 'k_Cyc_High_T_Ref', 'k_Cyc_Low_T_Ref', 'k_Cyc_Low_T_High_SOC_Ref',
+                   'Ea_Cal', 'Ea_Cyc_High_T', 'Ea_Cyc_Low_T', 'Ea_Cyc_Low_T_High_SOC',
+                   'alpha', 'beta_Low_T', 'beta_Low_T_High_SOC', 'SOC_Ref', 'T_Ref', 'I_Ch_Ref',
+                   'Ua_Ref', 'k0', 'C0')
+
+
+def get_parameters():
+    return {name: globals()[name] for name in PARAMETER_NAMES}
+
+
+# Temporarily replaces Table IV constants, e.g. with parameter_overrides(Ea_Cal=2.1e4): ...
+@contextmanager
+def parameter_overrides(**overrides):
+    unknown = set(overrides) - set(PARAMETER_NAMES)
+    if unknown:
+        raise KeyError(f"Unknown aging model parameters: {sorted(unknown)}")
+    previous = {name: globals()[name] for name in overrides}
+    globals().update(overrides)
+    try:
+        yield
+    finally:
+        globals().update(previous)
+
 # Equation 9 : Temperature and SOC dependence for Calendar Aging
 def k_Cal(T, SOC):
     term1 = np.exp(-Ea_Cal * (1/T - 1/T_Ref) / Rg)
@@ -58,10 +82,79 @@ def k_Cyc_Low_T_Current(T, I_Ch):
 def k_Cyc_Low_T_High_SOC(T, I_Ch, SOC):
     temp_term = np.exp(Ea_Cyc_Low_T_High_SOC / Rg * (1 / T - 1 / T_Ref))
     current_term = np.exp(beta_Low_T_High_SOC * (I_Ch - I_Ch_Ref) / C0)
-    sgn_SOC = 1 if SOC >= SOC_Ref else 0  # SOC가 SOC_Ref 이상일 때만 계산 적용
+    sgn_SOC = np.where(np.asarray(SOC) >= SOC_Ref, 1, 0)  # SOC가 SOC_Ref 이상일 때만 계산 적용
     return k_Cyc_Low_T_High_SOC_Ref * temp_term * current_term * sgn_SOC
 
+
+# Equations 9, 15, 18 and 21 in a single pass.
+# T, I_Ch and SOC may be scalars or arrays of any broadcastable shape; the inverse temperature
+# offset, the current offset and Ua(x_a(SOC)) are computed once and shared by the four rates.
+# params overrides Table IV values for this call only ({'Ea_Cal': 2.1e4, ...}); a value may be an
+# array, e.g. of shape (P, 1) to evaluate P parameter sets against a (samples,) profile at once.
+# Returns (k_cal, k_cyc_high_T, k_cyc_low_T, k_cyc_low_T_high_SOC), each with the broadcast shape.
+def k_all(T, I_Ch, SOC, params=None):
+    T = np.asarray(T, dtype=float)
+    I_Ch = np.asarray(I_Ch, dtype=float)
+    SOC = np.asarray(SOC, dtype=float)
+    p = _parameter_values(params)
+    shape = np.broadcast_shapes(T.shape, I_Ch.shape, SOC.shape, *(np.shape(p[name]) for name in params or ()))
+
+    inv_T = (1 / T - 1 / p['T_Ref']) / Rg
+    current_offset = (I_Ch - p['I_Ch_Ref']) / p['C0']
+    Ua_term = np.exp(p['alpha'] * F * (p['Ua_Ref'] - Ua_SOC(x_a(SOC))) / (Rg * p['T_Ref']))
+
+    k_cal = p['k_Cal_Ref'] * np.exp(-p['Ea_Cal'] * inv_T) * (Ua_term + p['k0'])
+    k_cyc_high_T = p['k_Cyc_High_T_Ref'] * np.exp(-p['Ea_Cyc_High_T'] * inv_T)
+    k_cyc_low_T = p['k_Cyc_Low_T_Ref'] * np.exp(p['Ea_Cyc_Low_T'] * inv_T + p['beta_Low_T'] * current_offset)
+    k_cyc_low_T_high_SOC = (p['k_Cyc_Low_T_High_SOC_Ref']
+                            * np.exp(p['Ea_Cyc_Low_T_High_SOC'] * inv_T + p['beta_Low_T_High_SOC'] * current_offset)
+                            * (SOC >= p['SOC_Ref']))
+
+    return tuple(_broadcast_full(k, shape) for k in (k_cal, k_cyc_high_T, k_cyc_low_T, k_cyc_low_T_high_SOC))
+
+
+def _parameter_values(params):
+    values = get_parameters()
+    if params:
+        unknown = set(params) - set(PARAMETER_NAMES)
+        if unknown:
+            raise KeyError(f"Unknown aging model parameters: {sorted(unknown)}")
+        values.update((name, np.asarray(value, dtype=float)) for name, value in params.items())
+    return values
+
+
+# k_all for one operating point with plain floats (math instead of numpy), for per-sample callers
+# where numpy's per-call overhead would dominate.
+def k_all_scalar(T, I_Ch, SOC):
+    inv_T = (1 / T - 1 / T_Ref) / Rg
+    current_offset = (I_Ch - I_Ch_Ref) / C0
+    x = 8.5e-3 + 0.01 * SOC * (7.8e-1 - 8.5e-3)
+    Ua = (0.6379 + 0.5416 * exp(-305.5309 * x)
+          + 0.044 * tanh(-(x - 0.1958) / 0.1088)
+          - 0.1978 * tanh((x - 1.0571) / 0.0854)
+          - 0.6875 * tanh((x + 0.0117) / 0.0529)
+          - 0.0175 * tanh((x - 0.5692) / 0.0875))
+    Ua_term = exp(alpha * F * (Ua_Ref - Ua) / (Rg * T_Ref))
+
+    k_cal = k_Cal_Ref * exp(-Ea_Cal * inv_T) * (Ua_term + k0)
+    k_cyc_high_T = k_Cyc_High_T_Ref * exp(-Ea_Cyc_High_T * inv_T)
+    k_cyc_low_T = k_Cyc_Low_T_Ref * exp(Ea_Cyc_Low_T * inv_T + beta_Low_T * current_offset)
+    k_cyc_low_T_high_SOC = (k_Cyc_Low_T_High_SOC_Ref
+                            * exp(Ea_Cyc_Low_T_High_SOC * inv_T + beta_Low_T_High_SOC * current_offset)
+                            if SOC >= SOC_Ref else 0.0)
+    return k_cal, k_cyc_high_T, k_cyc_low_T, k_cyc_low_T_high_SOC
+
+
+def _broadcast_full(values, shape):
+    if values.shape == shape:
+        return values
+    return np.broadcast_to(values, shape).copy()
+
 """
+# matplotlib is only needed for these surface plots and is not imported with the rate functions
+import matplotlib.pyplot as plt
+from mpl_toolkits.mplot3d import Axes3D
+
 # Creating the mesh for Temperature and SOC
 temperature_celsius = np.linspace(0, 60, 101)  # Temperature range (°C)
 soc_range = np.linspace(0, 100, 101)           # SOC range
@@ -71,22 +164,12 @@ T_mesh_celsius, SOC_mesh = np.meshgrid(temperature_celsius, soc_range)
 current_range = np.linspace(0, 3, 101)  # Current range (0C to 1C(3A))
 T_mesh_celsius, Current_mesh = np.meshgrid(temperature_celsius, current_range)
 
-# Calculate k_Cal values for the mesh
-k_Cal_mesh_celsius = np.array([[k_Cal(T+273.15, SOC) for T, SOC in zip(t_row, SOC_mesh_row)]
-                               for t_row, SOC_mesh_row in zip(T_mesh_celsius, SOC_mesh)])
-
-# Calculate k_Cyc_High_T values for the mesh
-k_Cyc_High_T_mesh = np.array([[k_Cyc_High_T(T+273.15) for T in t_row] for t_row in T_mesh_celsius])
-
-# Calculate k_Cyc_Low_T_Current for the mesh
-k_Cyc_Low_T_mesh = np.array([[k_Cyc_Low_T_Current(T+273.15, Current) for T, Current in zip(t_row, Current_mesh_row)]
-                             for t_row, Current_mesh_row in zip(T_mesh_celsius, Current_mesh)])
-# Calculate k_Cyc_Low_T_High_SOC for the mesh
-# k_Cyc_Low_T_High_SOC_mesh = np.array([[k_Cyc_Low_T_High_SOC(T+273.15, Current, SOC) for T, Current, SOC in zip(t_row, Current_mesh_row, SOC_mesh_row)]
-#                              for t_row, Current_mesh_row, SOC_mesh_row in zip(T_mesh_celsius, Current_mesh, SOC_mesh)])
-# Calculate k_Cyc_Low_T_High_SOC for the mesh
-k_Cyc_Low_T_High_SOC_mesh = np.array([[k_Cyc_Low_T_High_SOC(T+273.15, Current, 90) for T, Current in zip(t_row, Current_mesh_row)]
-                             for t_row, Current_mesh_row in zip(T_mesh_celsius, Current_mesh)])
+# Calculate the rate meshes by broadcasting (Rate_Surface.rate_grid builds full (T, SOC, I) grids)
+k_Cal_mesh_celsius = k_Cal(T_mesh_celsius + 273.15, SOC_mesh)
+k_Cyc_High_T_mesh = k_Cyc_High_T(T_mesh_celsius + 273.15)
+k_Cyc_Low_T_mesh = k_Cyc_Low_T_Current(T_mesh_celsius + 273.15, Current_mesh)
+# Calculate k_Cyc_Low_T_High_SOC for the mesh at SOC = 90
+k_Cyc_Low_T_High_SOC_mesh = k_Cyc_Low_T_High_SOC(T_mesh_celsius + 273.15, Current_mesh, 90)
 
 
 # Plotting the 3D surface plot
@@ -1,11 +1,10 @@
-import pandas as pd
-from datetime import datetime, timedelta
+# pandas is imported by the CSV functions themselves, so the coulomb counting (clamped_cumsum,
+# CoulombCounter) loads without it
+import numpy as np
 
 # 데이터 파일 경로
 chg_data_path = r"C:\Users\WSONG\SynologyDrive\SamsungSTF\Data\Aging_Model\Scaled_CCCV_chg.csv"
 dcg_data_path = r"C:\Users\WSONG\SynologyDrive\SamsungSTF\Data\Aging_Model\Scaled_CCCV_dcg.csv"
-chg_data = pd.read_csv(chg_data_path)
-dcg_data = pd.read_csv(dcg_data_path)
 
 # 저장할 파일 경로
 save_path = r"C:\Users\WSONG\SynologyDrive\SamsungSTF\Data\Aging_Model\CRDR.csv"
@@ -14,65 +13,171 @@ save_path = r"C:\Users\WSONG\SynologyDrive\SamsungSTF\Data\Aging_Model\CRDR.csv"
 C0_Ah = 1.54  # 배터리의 총 용량 (Ah)
 C0_As = C0_Ah * 3600  # 총 용량을 As (Ampere-second)로 변환
 
+TIME_COLUMN = 'Relative Time(h:min:s.ms)'
+CRDR_COLUMNS = ['Time (seconds)', 'Current(mA)', 'Scaled Voltage(V)', 'SOC']
+
+
+# SOC after each increment with the sequential clamping rule new = previous + increment and
+#   charge:    new > 99 -> 100
+#   discharge: new < 1  -> 0
+# Between clamps SOC is a plain cumulative sum. Once clamped it stays at the clamp value as long as
+# every increment would trigger the rule again (charge: increment > -1, discharge: increment < 1), so
+# the work is a few cumulative operations per clamp episode instead of one Python step per sample.
+def clamped_cumsum(initial_SOC, increments, direction='charge'):
+    increments = np.asarray(increments, dtype=float)
+    SOC = np.empty(len(increments))
+    clamp_value = 100 if direction == 'charge' else 0
+    position = 0
+    value = initial_SOC
+    while position < len(increments):
+        # cumsum over [value, increments...] adds in the same order as the row-by-row loop
+        free = np.cumsum(np.concatenate([[value], increments[position:]]))[1:]
+        hit = free > 99 if direction == 'charge' else free < 1
+        if not hit.any():
+            SOC[position:] = free
+            break
+        first = position + int(hit.argmax())
+        SOC[position:first] = free[:first - position]
+
+        stays = increments[first + 1:] > -1 if direction == 'charge' else increments[first + 1:] < 1
+        if stays.all():
+            SOC[first:] = clamp_value
+            break
+        escape = first + 1 + int(stays.argmin())
+        SOC[first:escape] = clamp_value
+        value = clamp_value + increments[escape]
+        SOC[escape] = value
+        position = escape + 1
+    return SOC
+
+
+class CoulombCounter:
+    # Coulomb counting that can be fed a profile in consecutive chunks; the SOC, time and current of
+    # the last sample are carried over so the result does not depend on the chunk boundaries.
+    def __init__(self, initial_SOC, direction='charge', capacity_As=C0_As):
+        self.SOC = initial_SOC
+        self.direction = direction
+        self.capacity_As = capacity_As
+        self.last_time = None
+        self.last_current = None
+
+    def update(self, time_seconds, current_mA):
+        time_seconds = np.asarray(time_seconds, dtype=float)
+        current_A = np.asarray(current_mA, dtype=float) / 1000  # mA to A
+        if len(time_seconds) == 0:
+            return np.empty(0)
+
+        if self.last_time is None:
+            # the first sample keeps the initial SOC
+            delta_Q_As = current_A[:-1] * np.diff(time_seconds)  # ΔQ = I * Δt
+            SOC = np.concatenate([[self.SOC], clamped_cumsum(self.SOC, delta_Q_As / self.capacity_As * 100, self.direction)])
+        else:
+            previous_current = np.concatenate([[self.last_current], current_A[:-1]])
+            delta_Q_As = previous_current * np.diff(time_seconds, prepend=self.last_time)
+            SOC = clamped_cumsum(self.SOC, delta_Q_As / self.capacity_As * 100, self.direction)
+
+        self.SOC = SOC[-1]
+        self.last_time = time_seconds[-1]
+        self.last_current = current_A[-1]
+        return SOC
+
+
 def calculate_SOC(data, initial_SOC, direction='charge'):
-    SOC = [initial_SOC]
-    for i in range(1, len(data)):
-        time_diff = (pd.to_datetime(data.iloc[i]['Relative Time(h:min:s.ms)']) - pd.to_datetime(data.iloc[i-1]['Relative Time(h:min:s.ms)'])).total_seconds()
-        current_A = data.iloc[i-1]['Current(mA)'] / 1000  # mA to A
-        delta_Q_As = current_A * time_diff  # ΔQ = I * Δt
-
-        if direction == 'charge':
-            new_SOC = SOC[-1] + (delta_Q_As / C0_As) * 100
-            if new_SOC > 99:
-                new_SOC = 100
-        else:  # direction == 'discharge'
-            new_SOC = SOC[-1] + (delta_Q_As / C0_As) * 100
-            if new_SOC < 1:
-                new_SOC = 0
-
-        SOC.append(new_SOC)
-    data['SOC'] = SOC
-
-# 충전 데이터에 대해 SOC 계산
-calculate_SOC(chg_data, initial_SOC=0, direction='charge')
-
-# 방전 데이터에 대해 SOC 계산
-calculate_SOC(dcg_data, initial_SOC=100, direction='discharge')
-
-# "Relative Time(h:min:s.ms)"를 datetime 객체로 변환
-chg_data['Time'] = pd.to_datetime(chg_data['Relative Time(h:min:s.ms)'])
-dcg_data['Time'] = pd.to_datetime(dcg_data['Relative Time(h:min:s.ms)'])
-
-# 첫 번째 휴식 기간을 추가하기 위한 마지막 시간 계산
-last_time_chg = chg_data['Time'].iloc[-1]
-rest_time_1 = last_time_chg + timedelta(hours=1)
-
-# 방전 데이터의 시작 시간을 첫 번째 휴식 기간 이후로 설정
-start_time_dcg = rest_time_1
-dcg_data['Time'] = start_time_dcg + (dcg_data['Time'] - dcg_data['Time'].iloc[0])
-
-# 두 번째 휴식 기간을 추가하기 위한 마지막 시간 계산
-last_time_dcg = dcg_data['Time'].iloc[-1]
-rest_time_2 = last_time_dcg + timedelta(hours=1)
-
-# 휴식 기간 데이터 생성
-rest_period_1 = pd.DataFrame({'Time': [rest_time_1],
-                              'Current(mA)': [0],
-                              'Scaled Voltage(V)': [chg_data['Scaled Voltage(V)'].iloc[-1]],
-                              'SOC': [chg_data['SOC'].iloc[-1]]})
-
-rest_period_2 = pd.DataFrame({'Time': [rest_time_2],
-                              'Current(mA)': [0],
-                              'Scaled Voltage(V)': [dcg_data['Scaled Voltage(V)'].iloc[-1]],
-                              'SOC': [dcg_data['SOC'].iloc[-1]]})
-
-# 모든 데이터 결합
-total_process = pd.concat([chg_data, rest_period_1, dcg_data, rest_period_2], ignore_index=True)
-
-# 'Time' 열의 차이를 초 단위로 계산하여 새로운 열에 저장
-total_process['Time (seconds)'] = (total_process['Time'] - total_process['Time'].iloc[0]).dt.total_seconds()
-
-# "Time (seconds)", "Current(mA)", "Scaled Voltage(V)", "SOC" 열만 선택하여 CSV 파일로 저장
-total_process.to_csv(save_path, columns=['Time (seconds)', 'Current(mA)', 'Scaled Voltage(V)', 'SOC'], index=False)
-
-print("Data saved to:", save_path)
\ No newline at end of file
+    import pandas as pd
+    time = pd.to_timedelta(data[TIME_COLUMN])
+    time_seconds = (time - time.iloc[0]).dt.total_seconds().values
+    data['SOC'] = CoulombCounter(initial_SOC, direction).update(time_seconds, data['Current(mA)'].values)
+
+
+def _write_rows(frame, path, header):
+    frame.to_csv(path, columns=CRDR_COLUMNS, index=False, mode='w' if header else 'a', header=header)
+
+
+# Streams one cycler CSV in chunks, appending CRDR rows to save_path.
+# time_offset is added to the file's own relative time; returns the last row (time, voltage, SOC).
+def _stream_segment(path, save_path, counter, time_offset, header, chunksize):
+    import pandas as pd
+    start_time = None
+    last_row = None
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        time = pd.to_timedelta(chunk[TIME_COLUMN])
+        if start_time is None:
+            start_time = time.iloc[0]
+        time_seconds = (time - start_time).dt.total_seconds().values
+
+        chunk['SOC'] = counter.update(time_seconds, chunk['Current(mA)'].values)
+        chunk['Time (seconds)'] = time_seconds + time_offset
+        _write_rows(chunk, save_path, header)
+        header = False
+        last_row = (chunk['Time (seconds)'].iloc[-1], chunk['Scaled Voltage(V)'].iloc[-1], chunk['SOC'].iloc[-1])
+    return last_row
+
+
+# Voltage (V) the cell rests at before the first current flows in a cycler CSV: the last of the
+# leading zero-current rows, or the first row when the file starts under load. The default column is
+# the measured voltage, the scale OCV tests are recorded on.
+def rest_voltage(path, voltage_column='Voltage(V)', chunksize=1_000_000):
+    import pandas as pd
+    voltage = None
+    for chunk in pd.read_csv(path, usecols=['Current(mA)', voltage_column], chunksize=chunksize):
+        loaded = np.flatnonzero(chunk['Current(mA)'].to_numpy() != 0)
+        if len(loaded) == 0:
+            voltage = chunk[voltage_column].iloc[-1]
+        elif loaded[0] > 0:
+            return float(chunk[voltage_column].iloc[loaded[0] - 1])
+        else:
+            return float(chunk[voltage_column].iloc[0] if voltage is None else voltage)
+    return float(voltage)
+
+
+# Initial SOC of a cycler file from its rest voltage on an OCV_Table.OCVTable. A rest before charging
+# follows a discharge, so it is read on the discharge branch (and vice versa). The voltage is read
+# from the table's cycler_column unless voltage_column is given; a rest voltage more than tolerance
+# (V) outside the table's range means the two are not on the same scale (e.g. 'Scaled Voltage(V)'
+# against a raw OCV test) and raises ValueError instead of clamping to an end of the table.
+def initial_SOC_from_rest(path, ocv_table, direction='charge', voltage_column=None, tolerance=0.05):
+    voltage_column = voltage_column or ocv_table.cycler_column
+    voltage = rest_voltage(path, voltage_column)
+    low, high = ocv_table.voltage_range
+    if not low - tolerance <= voltage <= high + tolerance:
+        raise ValueError(f"{path}: rest voltage {voltage:.3f} V ({voltage_column}) is outside the OCV table range "
+                         f"[{low:.3f}, {high:.3f}] V; the column and the table must use the same voltage scale")
+    branch = 'discharge' if direction == 'charge' else 'charge'
+    return float(ocv_table.soc(voltage, branch))
+
+
+# Builds the charge - 1 h rest - discharge - 1 h rest (CRDR) profile with bounded memory: both cycler
+# files are read chunksize rows at a time and the SOC state is carried across chunks.
+# An initial SOC of None is derived from the file's rest voltage with ocv_table (OCV_Table.OCVTable)
+# instead of assuming an empty (charge) or full (discharge) cell.
+def build_CRDR(chg_path, dcg_path, save_path, chunksize=1_000_000, initial_chg_SOC=0, initial_dcg_SOC=100,
+               ocv_table=None):
+    import pandas as pd
+    if (initial_chg_SOC is None or initial_dcg_SOC is None) and ocv_table is None:
+        raise ValueError("An initial SOC of None is derived from the rest voltage and needs an ocv_table "
+                         "(OCV_Table.load_table)")
+    if initial_chg_SOC is None:
+        initial_chg_SOC = initial_SOC_from_rest(chg_path, ocv_table, 'charge')
+    if initial_dcg_SOC is None:
+        initial_dcg_SOC = initial_SOC_from_rest(dcg_path, ocv_table, 'discharge')
+    chg_end_time, chg_end_voltage, chg_end_SOC = _stream_segment(
+        chg_path, save_path, CoulombCounter(initial_chg_SOC, 'charge'), 0.0, True, chunksize)
+
+    # 첫 번째 휴식 기간 후 방전 시작
+    rest_time_1 = chg_end_time + 3600
+    rest_period_1 = pd.DataFrame({'Time (seconds)': [rest_time_1], 'Current(mA)': [0.0],
+                                  'Scaled Voltage(V)': [chg_end_voltage], 'SOC': [chg_end_SOC]})
+    _write_rows(rest_period_1, save_path, False)
+
+    dcg_end_time, dcg_end_voltage, dcg_end_SOC = _stream_segment(
+        dcg_path, save_path, CoulombCounter(initial_dcg_SOC, 'discharge'), rest_time_1, False, chunksize)
+
+    # 두 번째 휴식 기간
+    rest_period_2 = pd.DataFrame({'Time (seconds)': [dcg_end_time + 3600], 'Current(mA)': [0.0],
+                                  'Scaled Voltage(V)': [dcg_end_voltage], 'SOC': [dcg_end_SOC]})
+    _write_rows(rest_period_2, save_path, False)
+
+
+if __name__ == '__main__':
+    build_CRDR(chg_data_path, dcg_data_path, save_path)
+    print("Data saved to:", save_path)
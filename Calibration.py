@@ -0,0 +1,150 @@
+import itertools
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+from scipy.optimize import least_squares
+
+import Aging_Model
+from Cycle_Engine import CycleProfile
+
+# Table IV constants refitted by default (reference temperature / current / SOC, Ua_Ref and C0 stay fixed)
+FIT_PARAMETERS = ('k_Cal_Ref', 'k_Cyc_High_T_Ref', 'k_Cyc_Low_T_Ref', 'k_Cyc_Low_T_High_SOC_Ref',
+                  'Ea_Cal', 'Ea_Cyc_High_T', 'Ea_Cyc_Low_T', 'Ea_Cyc_Low_T_High_SOC',
+                  'alpha', 'beta_Low_T', 'beta_Low_T_High_SOC', 'k0')
+
+# One aging test: the repeated cycle (time [h], current [A], Temperature [K], SOC [%]) and the
+# capacity checks after `cycles` cycles with the measured loss Q_loss (1 - capacity / C0).
+# sigma (same shape as Q_loss, optional) weights the residuals as (model - Q_loss) / sigma.
+FadeMeasurement = namedtuple('FadeMeasurement', ['base_time', 'current', 'Temperature', 'SOC', 'cycles', 'Q_loss', 'sigma'],
+                             defaults=(None,))
+
+
+class CalibrationProblem:
+    # Least-squares problem over log(parameter values): every parameter is positive and log scaling
+    # puts pre-factors and activation energies on comparable steps.
+    # predict() evaluates any number of candidate parameter sets in one pass: the sets become a
+    # leading axis of the rate arrays (k_all params of shape (P, 1)), and each test is integrated
+    # for all of them by one CycleProfile, whose cumulative_losses costs O(order) per capacity check
+    # however many cycles the test ran. The Jacobian is the base point plus one forward step per
+    # parameter, evaluated as a single batch.
+    def __init__(self, measurements, names=FIT_PARAMETERS, bounds=None, bound_factor=4.0, integrator='trapz',
+                 relative_step=1e-6, batch_size=64, **options):
+        self.measurements = [FadeMeasurement(*(None if values is None else np.asarray(values, dtype=float) for values in test))
+                             for test in measurements]
+        self.names = tuple(names)
+        unknown = set(self.names) - set(Aging_Model.PARAMETER_NAMES)
+        if unknown:
+            raise KeyError(f"Unknown aging model parameters: {sorted(unknown)}")
+        initial = Aging_Model.get_parameters()
+        self.initial = np.array([initial[name] for name in self.names], dtype=float)
+        bounds = bounds or {}
+        self.lower = np.log([bounds.get(name, (value / bound_factor, value * bound_factor))[0]
+                             for name, value in zip(self.names, self.initial)])
+        self.upper = np.log([bounds.get(name, (value / bound_factor, value * bound_factor))[1]
+                             for name, value in zip(self.names, self.initial)])
+        self.integrator = integrator
+        self.relative_step = relative_step
+        self.batch_size = batch_size
+        self.options = options
+
+        self.measured = np.concatenate([test.Q_loss.ravel() for test in self.measurements])
+        self.sigma = np.concatenate([np.ones(test.Q_loss.size) if test.sigma is None else np.broadcast_to(test.sigma, test.Q_loss.shape).ravel()
+                                     for test in self.measurements])
+        self._last = (None, None)
+
+    def predict(self, values):
+        # Modelled Q_total at every capacity check for parameter sets values (P, len(names));
+        # returns (P, checks), the checks of all tests concatenated in order
+        values = np.atleast_2d(np.asarray(values, dtype=float))
+        blocks = []
+        for start in range(0, len(values), self.batch_size):
+            batch = values[start:start + self.batch_size]
+            params = {name: batch[:, i, None] for i, name in enumerate(self.names)}
+            rate_function = partial(Aging_Model.k_all, params=params)
+            predicted = []
+            for test in self.measurements:
+                profile = CycleProfile(test.base_time, test.current, test.Temperature, test.SOC, integrator=self.integrator,
+                                       rate_function=rate_function, **self.options)
+                cycles = np.rint(test.cycles.ravel()).astype(np.int64)
+                predicted.append(np.broadcast_to(profile.cumulative_losses(cycles)['Q_total'], (len(batch), cycles.size)))
+            blocks.append(np.concatenate(predicted, axis=-1))
+        return np.concatenate(blocks, axis=0)
+
+    def batch_residuals(self, theta):
+        # residuals of parameter sets theta (P, len(names)) in log space, shape (P, checks)
+        return (self.predict(np.exp(theta)) - self.measured) / self.sigma
+
+    def residuals(self, theta):
+        theta = np.asarray(theta, dtype=float)
+        key, value = self._last
+        if key is not None and np.array_equal(key, theta):
+            return value
+        value = self.batch_residuals(theta[None, :])[0]
+        self._last = (theta.copy(), value)
+        return value
+
+    def jacobian(self, theta):
+        theta = np.asarray(theta, dtype=float)
+        steps = self.relative_step * np.maximum(np.abs(theta), 1)
+        # step away from the upper bound so every evaluated point is feasible
+        steps = np.where(theta + steps > self.upper, -steps, steps)
+        points = np.vstack([theta, theta + np.diag(steps)])
+        evaluated = self.batch_residuals(points)
+        self._last = (theta.copy(), evaluated[0])
+        return ((evaluated[1:] - evaluated[0]) / steps[:, None]).T
+
+    def cost(self, theta):
+        return 0.5 * np.sum(self.batch_residuals(np.atleast_2d(theta)) ** 2, axis=-1)
+
+
+def _fit_from(problem, theta, options):
+    result = least_squares(problem.residuals, theta, jac=problem.jacobian, bounds=(problem.lower, problem.upper), **options)
+    return {
+        'parameters': dict(zip(problem.names, np.exp(result.x))),
+        'cost': result.cost,
+        'status': result.status,
+        'message': result.message,
+        'nfev': result.nfev,
+        'njev': result.njev,
+        'start': dict(zip(problem.names, np.exp(theta))),
+    }
+
+
+# Multi-start fit of the Table IV constants `names` to measured fade data (a list of FadeMeasurement).
+# num_candidates log-uniform draws inside the bounds (default: Table IV value / bound_factor ...
+# * bound_factor) are screened in batched predict() calls; the current Table IV values and the
+# best num_starts - 1 candidates then start independent least_squares runs, spread over a process
+# pool (max_workers=1 runs in-process). Extra keyword arguments go to CalibrationProblem (e.g.
+# integrator, bounds); least_squares_options to scipy.optimize.least_squares.
+# Returns {'parameters': best fit {name: value}, 'cost', 'residuals', 'fits': every run, best first}.
+# The fit does not modify Aging_Model; apply it with Aging_Model.parameter_overrides(**fit['parameters']).
+def calibrate(measurements, names=FIT_PARAMETERS, num_starts=8, num_candidates=256, seed=0, max_workers=None,
+              least_squares_options=None, **problem_options):
+    problem = CalibrationProblem(measurements, names, **problem_options)
+    rng = np.random.default_rng(seed)
+    candidates = rng.uniform(problem.lower, problem.upper, size=(num_candidates, len(problem.names)))
+    best = np.argsort(problem.cost(candidates))[:max(num_starts - 1, 0)]
+    starts = [np.clip(np.log(problem.initial), problem.lower, problem.upper)] + list(candidates[best])
+
+    options = dict(x_scale='jac')
+    options.update(least_squares_options or {})
+    if max_workers is None:
+        max_workers = min(os.cpu_count() or 1, len(starts))
+    if max_workers == 1:
+        fits = [_fit_from(problem, theta, options) for theta in starts]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            fits = list(pool.map(_fit_from, itertools.repeat(problem), starts, itertools.repeat(options)))
+
+    fits.sort(key=lambda fit: fit['cost'])
+    best_fit = fits[0]
+    theta = np.log([best_fit['parameters'][name] for name in problem.names])
+    return {
+        'parameters': best_fit['parameters'],
+        'cost': best_fit['cost'],
+        'residuals': problem.residuals(theta),
+        'fits': fits,
+    }
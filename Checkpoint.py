@@ -0,0 +1,102 @@
+import hashlib
+import os
+import time as tm
+from functools import partial
+
+import numpy as np
+import Aging_Model
+
+
+# Identifies a run: the profile arrays and the settings that change its results. A checkpoint is only
+# resumed by a run with the same key.
+def state_key(*arrays, **settings):
+    digest = hashlib.sha256()
+    for values in arrays:
+        values = np.ascontiguousarray(values, dtype=float)
+        digest.update(str(values.shape).encode())
+        digest.update(values.tobytes())
+    digest.update(repr(sorted(settings.items())).encode())
+    return digest.hexdigest()
+
+
+def _plain(value):
+    # numbers, arrays and containers as plain Python values, so their repr is complete and exact
+    if isinstance(value, dict):
+        return sorted((str(name), _plain(item)) for name, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if isinstance(value, (np.ndarray, np.generic, int, float)) and not isinstance(value, bool):
+        return np.asarray(value, dtype=float).tolist()
+    return value
+
+
+# state_key setting of a rate function: its qualified name, the arguments bound by functools.partial
+# and the Aging_Model parameters in effect (parameter_overrides changes the module globals) with the
+# partial's params= merged in. A lambda, a local function or a callable object cannot be told apart
+# from another one of the same name and raises ValueError.
+def rate_function_key(rate_function):
+    arguments = ()
+    keywords = {}
+    if isinstance(rate_function, partial):
+        arguments = rate_function.args
+        keywords = dict(rate_function.keywords)
+        rate_function = rate_function.func
+    name = f"{getattr(rate_function, '__module__', None)}.{getattr(rate_function, '__qualname__', '<object>')}"
+    if '<' in name:
+        raise ValueError(f"Cannot identify rate function {rate_function!r} for a checkpoint; use a module-level "
+                         f"function or a functools.partial of one")
+    parameters = dict(Aging_Model.get_parameters(), **(keywords.pop('params', None) or {}))
+    return name, _plain(arguments), _plain(keywords), _plain(parameters)
+
+
+class Checkpointer:
+    # Periodic engine checkpoints in one .npz file: due() is true every every_cycles cycles and / or
+    # once every_seconds have passed since the last save. save() writes the state to a temporary file,
+    # syncs it and moves it over the previous checkpoint, so the file on disk is always a complete
+    # checkpoint (the old one if the process dies mid-write). Arrays and float64 scalars are stored
+    # bit-exactly, which makes a resumed run identical to an uninterrupted one.
+    # seconds / saves / bytes account for the checkpoint overhead.
+    def __init__(self, path, every_cycles=None, every_seconds=None):
+        self.path = path
+        self.every_cycles = every_cycles
+        self.every_seconds = every_seconds
+        self.seconds = 0.0
+        self.saves = 0
+        self.bytes = 0
+        self._last_save = tm.perf_counter()
+
+    def due(self, cycles_done):
+        if self.every_cycles and cycles_done % self.every_cycles == 0:
+            return True
+        return bool(self.every_seconds) and tm.perf_counter() - self._last_save >= self.every_seconds
+
+    def save(self, key, state):
+        start = tm.perf_counter()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        temporary = self.path + '.tmp'
+        with open(temporary, 'wb') as file:
+            np.savez(file, checkpoint_key=key, **state)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.path)
+        self.bytes = os.path.getsize(self.path)
+        self.saves += 1
+        self._last_save = tm.perf_counter()
+        self.seconds += self._last_save - start
+
+    # The saved state ({name: array}), or None when there is no checkpoint yet. A checkpoint written
+    # by a different run (another key) raises ValueError instead of being silently mixed in.
+    def load(self, key):
+        try:
+            stored = np.load(self.path)
+        except FileNotFoundError:
+            return None
+        with stored:
+            if str(stored['checkpoint_key']) != key:
+                raise ValueError(f"Checkpoint {self.path} belongs to a different run; remove it to start over")
+            return {name: stored[name] for name in stored.files if name != 'checkpoint_key'}
+
+    def report(self):
+        return {'saves': self.saves, 'seconds': self.seconds, 'bytes': self.bytes,
+                'seconds_per_save': self.seconds / self.saves if self.saves else 0.0}
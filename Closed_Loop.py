@@ -0,0 +1,154 @@
+import numpy as np
+import Aging_Model
+from Aging_Model import k_all
+from Calc_SOC import C0_Ah, clamped_cumsum
+from Checkpoint import rate_function_key, state_key
+from Cycle_Engine import CycleData, _check_integrator
+from Cycle_Results import LOSS_KEYS, CycleResultStore
+
+
+# Runs of consecutive coulomb-count increments that share a clamping direction (charge: I > 0,
+# discharge: I < 0); rests join the run before them. Returns [(start, stop, direction), ...].
+def _direction_runs(current):
+    signs = np.sign(current[:-1])
+    nonzero = np.flatnonzero(signs)
+    if len(nonzero) == 0:
+        return [(0, len(signs), 'charge')]
+    # rests take the direction of the last non-zero increment (leading rests the first one)
+    filled = signs[nonzero[np.maximum(np.searchsorted(nonzero, np.arange(len(signs)), side='right') - 1, 0)]]
+    starts = np.concatenate([[0], np.flatnonzero(filled[1:] != filled[:-1]) + 1])
+    stops = np.concatenate([starts[1:], [len(signs)]])
+    return [(start, stop, 'charge' if filled[start] > 0 else 'discharge') for start, stop in zip(starts, stops)]
+
+
+class FadingSOC:
+    # Coulomb counting of one cycle for a given effective capacity, with the clamping rules of
+    # Calc_SOC (charge: above 99 % -> 100 %, discharge: below 1 % -> 0 %). The charge moved per
+    # sample interval (Ah) and the charge / discharge runs are computed once; a new capacity only
+    # rescales the increments.
+    def __init__(self, base_time, current):
+        base_time = np.asarray(base_time, dtype=float)
+        current = np.asarray(current, dtype=float)
+        self.charge_Ah = current[:-1] * np.diff(base_time)  # ΔQ = I * Δt, as in Calc_SOC
+        self.runs = _direction_runs(current)
+
+    def trace(self, initial_SOC, capacity_Ah):
+        increments = self.charge_Ah * (100 / capacity_Ah)
+        SOC = np.empty(len(increments) + 1)
+        SOC[0] = initial_SOC
+        for start, stop, direction in self.runs:
+            SOC[start + 1:stop + 1] = clamped_cumsum(SOC[start], increments[start:stop], direction)
+        return SOC
+
+
+# Cycle loop in which the capacity fades with the accumulated loss: cycle n is coulomb counted with
+# capacity_Ah * (1 - Q_total accumulated before cycle n), so its SOC swing, the time spent above
+# SOC_Ref and therefore k_Cal / k_Cyc_Low_T_High_SOC follow the fade. SOC is carried from the end of
+# one cycle to the start of the next; the first cycle starts at initial_SOC (default: SOC[0]).
+# base_time (h), current (A) and Temperature (K) describe one cycle as in run_cycles; SOC is only
+# used for its first value. The run stops early once the capacity has faded to stop_retention of
+# capacity_Ah; the remaining cycles are NaN and 'completed_cycles' gives the number simulated.
+# stop_retention must be positive so that no cycle is counted with a non-physical (zero or
+# negative) capacity; the last cycle run may end somewhat below it.
+# Returns the run_cycles layout plus per-cycle 'capacity' (Ah at the start of the cycle), 'SOC_min',
+# 'SOC_max' and 'time_above_SOC_Ref' (h).
+# checkpoint (Checkpoint.Checkpointer) resumes an interrupted run bit-identically, as in run_cycles.
+def run_closed_loop(base_time, current, Temperature, SOC, num_cycles, capacity_Ah=C0_Ah, integrator='trapz',
+                    initial_SOC=None, stop_retention=0.05, keep_every=None, keep_cycles=(), rate_function=k_all,
+                    profiler=None, progress=None, checkpoint=None, zero_denominator=1e-1):
+    _check_integrator(integrator)
+    if not 0 < stop_retention < 1:
+        raise ValueError(f"stop_retention must be between 0 and 1 (exclusive), got {stop_retention}")
+    base_time = np.asarray(base_time, dtype=float)
+    current = np.asarray(current, dtype=float)
+    Temperature = np.broadcast_to(np.asarray(Temperature, dtype=float), base_time.shape)
+    fading_SOC = FadingSOC(base_time, current)
+    time_intervals = np.diff(base_time, prepend=base_time[0])
+
+    store = CycleResultStore(num_cycles, keep_every, keep_cycles)
+    capacity = np.full(num_cycles, np.nan)
+    SOC_min = np.full(num_cycles, np.nan)
+    SOC_max = np.full(num_cycles, np.nan)
+    time_above_SOC_Ref = np.full(num_cycles, np.nan)
+
+    cycle_SOC = np.asarray(SOC, dtype=float)[0] if initial_SOC is None else initial_SOC
+    accumulated_loss = 0.0
+    initial_time = 0
+    initial_phi_ch = 0
+    initial_phi_total = 0
+    first_cycle = 0
+    if checkpoint is not None:
+        key = state_key(base_time, current, Temperature, engine='run_closed_loop', capacity_Ah=capacity_Ah,
+                        integrator=integrator, zero_denominator=zero_denominator, initial_SOC=float(cycle_SOC),
+                        stop_retention=stop_retention, keep_every=keep_every, keep_cycles=sorted(keep_cycles),
+                        rate_function=rate_function_key(rate_function))
+        state = checkpoint.load(key)
+        if state is not None:
+            store.restore(state)
+            first_cycle = store.recorded
+            for name, values in (('capacity', capacity), ('SOC_min', SOC_min), ('SOC_max', SOC_max),
+                                 ('time_above_SOC_Ref', time_above_SOC_Ref)):
+                values[:first_cycle] = state[name][:first_cycle]
+            # summed in cycle order like the loop, so a state cut to num_cycles gives the same total
+            for loss in store['Q_total']:
+                accumulated_loss += loss
+            # SOC after the last saved cycle; a state cut to num_cycles leaves no cycle to run with it
+            cycle_SOC = state['cycle_SOC'][()]
+            initial_time, initial_phi_ch, initial_phi_total = store.end_state()
+        saved = first_cycle
+
+    def save_checkpoint():
+        done = store.recorded
+        checkpoint.save(key, dict(store.state(), capacity=capacity[:done], SOC_min=SOC_min[:done], SOC_max=SOC_max[:done],
+                                  time_above_SOC_Ref=time_above_SOC_Ref[:done], cycle_SOC=cycle_SOC))
+        return done
+
+    for cycle in range(first_cycle, num_cycles):
+        if 1 - accumulated_loss <= stop_retention:
+            break
+        if profiler is not None:
+            profiler.start()
+        capacity[cycle] = capacity_Ah * (1 - accumulated_loss)
+        SOC_trace = fading_SOC.trace(cycle_SOC, capacity[cycle])
+        SOC_min[cycle] = SOC_trace.min()
+        SOC_max[cycle] = SOC_trace.max()
+        time_above_SOC_Ref[cycle] = time_intervals[SOC_trace >= Aging_Model.SOC_Ref].sum()
+        if profiler is not None:
+            profiler.lap('SOC')
+
+        cycle_data = CycleData(cycle, initial_time, initial_phi_ch, initial_phi_total)
+        cycle_data.calculate_loss(base_time, current, Temperature, SOC_trace, integrator, rate_function, profiler,
+                                  zero_denominator)
+        store.record(cycle, cycle_data)
+
+        accumulated_loss += cycle_data.total_losses
+        cycle_SOC = SOC_trace[-1]
+        initial_time = cycle_data.final_time[-1]
+        initial_phi_ch = cycle_data.final_phi_ch[-1]
+        initial_phi_total = cycle_data.final_phi_total[-1]
+        if profiler is not None:
+            profiler.lap('bookkeeping')
+        if checkpoint is not None and checkpoint.due(cycle + 1):
+            saved = save_checkpoint()
+            if profiler is not None:
+                profiler.lap('checkpoint')
+        if progress is not None:
+            progress.update(cycle + 1, capacity=f'{capacity[cycle]:.4f} Ah')
+    # the final state, so running the finished (or stopped) run again returns at once
+    if checkpoint is not None and store.recorded > saved:
+        save_checkpoint()
+
+    return {
+        'cycle': np.arange(1, num_cycles + 1),
+        'per_cycle': {key: store.columns[key].copy() for key in LOSS_KEYS},
+        'cumulative': {key: np.cumsum(store.columns[key]) for key in LOSS_KEYS},
+        'completed_cycles': store.recorded,
+        'capacity': capacity,
+        'SOC_min': SOC_min,
+        'SOC_max': SOC_max,
+        'time_above_SOC_Ref': time_above_SOC_Ref,
+        'final_time': initial_time,
+        'final_phi_ch': initial_phi_ch,
+        'final_phi_total': initial_phi_total,
+        'trajectories': store.trajectories,
+    }
@@ -0,0 +1,85 @@
+import numpy as np
+
+LOSS_KEYS = ('Q_cal', 'Q_cycle1', 'Q_cycle2', 'Q_cycle3', 'Q_cycle', 'Q_total')
+STATE_KEYS = ('end_time', 'end_phi_ch', 'end_phi_total')
+
+
+class CycleResultStore:
+    # Per-cycle results of a long run in preallocated arrays: the loss breakdown and the end
+    # time / phi_ch / phi_total of every cycle. Full trajectories (time, phi_ch, phi_total arrays)
+    # are only kept for every keep_every-th cycle and for the 0-based cycles in keep_cycles, so
+    # memory no longer grows as cycles x samples.
+    def __init__(self, num_cycles, keep_every=None, keep_cycles=()):
+        self.num_cycles = num_cycles
+        self.columns = {key: np.full(num_cycles, np.nan) for key in LOSS_KEYS + STATE_KEYS}
+        self.keep_every = keep_every
+        self.keep_cycles = set(keep_cycles)
+        self.trajectories = {}
+        self.recorded = 0
+
+    def keeps(self, cycle):
+        return cycle in self.keep_cycles or bool(self.keep_every and cycle % self.keep_every == 0)
+
+    def record(self, cycle, cycle_data):
+        # cycle_data: a CycleData after calculate_loss
+        columns = self.columns
+        columns['Q_cal'][cycle] = cycle_data.cal_losses
+        columns['Q_cycle1'][cycle] = cycle_data.cycle1_losses
+        columns['Q_cycle2'][cycle] = cycle_data.cycle2_losses
+        columns['Q_cycle3'][cycle] = cycle_data.cycle3_losses
+        columns['Q_cycle'][cycle] = cycle_data.cycle_losses
+        columns['Q_total'][cycle] = cycle_data.total_losses
+        columns['end_time'][cycle] = cycle_data.final_time[-1]
+        columns['end_phi_ch'][cycle] = cycle_data.final_phi_ch[-1]
+        columns['end_phi_total'][cycle] = cycle_data.final_phi_total[-1]
+        if self.keeps(cycle):
+            self.trajectories[cycle] = {'time': np.array(cycle_data.final_time),
+                                        'phi_ch': np.array(cycle_data.final_phi_ch),
+                                        'phi_total': np.array(cycle_data.final_phi_total)}
+        self.recorded = max(self.recorded, cycle + 1)
+
+    def record_losses(self, per_cycle, start=0):
+        # Bulk insert of per-cycle loss arrays, e.g. fast_forward(...)['per_cycle']
+        count = len(per_cycle['Q_total'])
+        for key in LOSS_KEYS:
+            self.columns[key][start:start + count] = per_cycle[key]
+        self.recorded = max(self.recorded, start + count)
+
+    def state(self):
+        # Flat {name: array} snapshot of the recorded cycles (for Checkpoint)
+        state = {f'column_{key}': values[:self.recorded] for key, values in self.columns.items()}
+        state['recorded'] = np.array(self.recorded)
+        for cycle, trajectory in self.trajectories.items():
+            for name, values in trajectory.items():
+                state[f'trajectory_{cycle}_{name}'] = values
+        return state
+
+    def restore(self, state):
+        # A state saved by a longer run is cut to this store's num_cycles, which leaves the run complete
+        recorded = min(int(state['recorded']), self.num_cycles)
+        for key, values in self.columns.items():
+            values[:recorded] = state[f'column_{key}'][:recorded]
+        self.recorded = recorded
+        self.trajectories = {}
+        for name, values in state.items():
+            if name.startswith('trajectory_'):
+                _, cycle, field = name.split('_', 2)
+                if int(cycle) < recorded:
+                    self.trajectories.setdefault(int(cycle), {})[field] = values
+
+    def end_state(self):
+        # (end_time, end_phi_ch, end_phi_total) of the last recorded cycle, where the next one starts
+        if not self.recorded:
+            return 0, 0, 0
+        return tuple(self.columns[key][self.recorded - 1] for key in STATE_KEYS)
+
+    def __getitem__(self, key):
+        return self.columns[key][:self.recorded]
+
+    def cumulative(self, key):
+        return np.cumsum(self[key])
+
+    @property
+    def nbytes(self):
+        trajectory_bytes = sum(values.nbytes for trajectory in self.trajectories.values() for values in trajectory.values())
+        return sum(values.nbytes for values in self.columns.values()) + trajectory_bytes
@@ -0,0 +1,67 @@
+import numpy as np
+from Cycle_Engine import CycleProfile
+
+
+# Fractional number of cycles after which capacity retention (1 - accumulated loss) first drops to
+# threshold (0.8 = 80 %, 0.7 = 70 %). profile is (time [h], current [A], SOC [%]) of one cycle and T
+# (K) may be an array of operating points, which are searched together. profile may also be a
+# CycleProfile that is already built (T and options are then unused): every row of its leading axes,
+# e.g. one per parameter draw, is searched as an operating point.
+# The crossing is bracketed by doubling the cycle count and then bisected on whole cycles, each step
+# being one CycleProfile.cumulative_losses evaluation (O(log N) in total); inside the crossing cycle
+# it is located from the per-sample running loss and interpolated in time.
+# Returns inf where the threshold is not reached within max_cycles.
+def cycles_to_threshold(profile, T, threshold=0.8, loss='Q_total', max_cycles=10 ** 7, **options):
+    if isinstance(profile, CycleProfile):
+        cycle_profile = profile
+        shape = cycle_profile.cumulative_losses(np.zeros(1, dtype=np.int64))[loss].shape[:-1]
+    else:
+        base_time, current, SOC = profile
+        T = np.asarray(T, dtype=float)
+        cycle_profile = CycleProfile(base_time, current, T[..., None], SOC, **options)
+        shape = T.shape
+    limit = 1 - threshold
+
+    def accumulated(num_cycles):
+        return cycle_profile.cumulative_losses(num_cycles[..., None])[loss][..., 0]
+
+    # Bracket: accumulated(low) < limit <= accumulated(high)
+    low = np.zeros(shape, dtype=np.int64)
+    high = np.ones(shape, dtype=np.int64)
+    while True:
+        below = accumulated(high) < limit
+        grow = below & (high < max_cycles)
+        if not np.any(grow):
+            break
+        low = np.where(grow, high, low)
+        high = np.where(grow, np.minimum(2 * high, max_cycles), high)
+    reached = ~below
+
+    # Bisect down to a single cycle
+    while True:
+        active = reached & (high - low > 1)
+        if not np.any(active):
+            break
+        middle = (low + high) // 2
+        below = accumulated(middle) < limit
+        low = np.where(active & below, middle, low)
+        high = np.where(active & ~below, middle, high)
+
+    # Locate the crossing inside cycle `low` (0-based)
+    remaining = limit - accumulated(low)
+    running = cycle_profile.running_losses(low)[loss]
+    crossed = running >= remaining[..., None]
+    index = np.where(crossed.any(axis=-1), crossed.argmax(axis=-1), running.shape[-1] - 1)
+    index = np.clip(index, 1, running.shape[-1] - 1)[..., None]
+    before = np.take_along_axis(running, index - 1, axis=-1)[..., 0]
+    after = np.take_along_axis(running, index, axis=-1)[..., 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weight = np.clip(np.where(after > before, (remaining - before) / (after - before), 1), 0, 1)
+
+    cycle_time = np.broadcast_to(cycle_profile.base_time, running.shape)
+    time_before = np.take_along_axis(cycle_time, index - 1, axis=-1)[..., 0]
+    time_after = np.take_along_axis(cycle_time, index, axis=-1)[..., 0]
+    crossing_time = time_before + weight * (time_after - time_before)
+    fraction = (crossing_time - cycle_time[..., 0]) / (cycle_time[..., -1] - cycle_time[..., 0])
+
+    return np.where(reached, low + fraction, np.inf)
@@ -0,0 +1,75 @@
+import time as tm
+
+
+class StageProfiler:
+    # Wall time per engine stage, recorded as laps: start() marks the beginning of a pass and every
+    # lap(stage) adds the time since the previous mark to that stage. The engines only call it when
+    # a profiler is passed (profiler=None costs one comparison per stage), so it can stay wired in.
+    # Stages used by the engines: 'rates' (k evaluation), 'phi' (time / phi_ch / phi_total cumsums),
+    # 'integrands', 'integrate', 'bookkeeping' (result storage, state hand-over) and 'checkpoint'.
+    def __init__(self):
+        self.seconds = {}
+        self.calls = {}
+        self.samples = 0
+        self.cycles = 0
+        self._mark = None
+
+    def start(self):
+        self._mark = tm.perf_counter()
+
+    def lap(self, stage):
+        now = tm.perf_counter()
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + (now - self._mark)
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+        self._mark = now
+
+    def count(self, samples=0, cycles=0):
+        self.samples += samples
+        self.cycles += cycles
+
+    def report(self):
+        # {'stages': {stage: {'seconds', 'calls', 'share'}}, 'seconds', 'samples', 'cycles',
+        #  'samples_per_second', 'cycles_per_second'}
+        total = sum(self.seconds.values())
+        stages = {stage: {'seconds': seconds, 'calls': self.calls[stage], 'share': seconds / total if total else 0.0}
+                  for stage, seconds in self.seconds.items()}
+        return {
+            'stages': stages,
+            'seconds': total,
+            'samples': self.samples,
+            'cycles': self.cycles,
+            'samples_per_second': self.samples / total if total else 0.0,
+            'cycles_per_second': self.cycles / total if total else 0.0,
+        }
+
+    def format_report(self):
+        report = self.report()
+        lines = [f"{'stage':<12} {'seconds':>9} {'share':>7} {'calls':>8}"]
+        for stage, values in sorted(report['stages'].items(), key=lambda item: -item[1]['seconds']):
+            lines.append(f"{stage:<12} {values['seconds']:>9.3f} {values['share']:>7.1%} {values['calls']:>8}")
+        lines.append(f"{report['cycles']} cycles, {report['samples']} samples in {report['seconds']:.3f} s "
+                     f"({report['cycles_per_second']:.0f} cycles/s, {report['samples_per_second']:.3g} samples/s)")
+        return '\n'.join(lines)
+
+
+class ProgressReporter:
+    # Rate-limited progress: update() is cheap to call every cycle and only reports when at least
+    # interval seconds have passed since the last report, and always on the last step. Reports go to
+    # callback(done, total, info) if given, otherwise one printed line.
+    def __init__(self, total, interval=1.0, callback=None, label='Cycle'):
+        self.total = total
+        self.interval = interval
+        self.callback = callback
+        self.label = label
+        self._last_report = tm.perf_counter()
+
+    def update(self, done, **info):
+        now = tm.perf_counter()
+        if now - self._last_report < self.interval and done < self.total:
+            return
+        self._last_report = now
+        if self.callback is not None:
+            self.callback(done, self.total, info)
+        else:
+            details = ', '.join(f'{key}: {value}' for key, value in info.items())
+            print(f"{self.label} {done}/{self.total}" + (f" ({details})" if details else ''))
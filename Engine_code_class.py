@@ -1,201 +1,201 @@
+import os
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
 import time as tm
-from Aging_Model import k_Cal, k_Cyc_High_T, k_Cyc_Low_T_Current, k_Cyc_Low_T_High_SOC
-class CycleData:
-    def __init__(self, cycle_number, initial_time = 0, initial_phi_ch = 0, initial_phi_total = 0):
-        self.cycle_number = cycle_number
-        self.cycle_losses = None
-        self.initial_time = initial_time
-        self.initial_phi_ch = initial_phi_ch
-        self.initial_phi_total = initial_phi_total
-        self.final_time = None
-        self.final_phi_ch = None
-        self.final_phi_total = None
-
-    def calculate_loss(self, base_time, current, Temperature, SOC):
-        # Adjust time by adding the initial time of this cycle
-        time = base_time + self.initial_time
-
-        # Calculate k_cal, k_cyc values
-        k_cal_values = np.array([k_Cal(t, soc) for t, soc in zip(Temperature, SOC)])
-        k_cyc_high_T_values = np.array([k_Cyc_High_T(t) for t in Temperature])
-        k_cyc_low_T_values = np.array([k_Cyc_Low_T_Current(t, cur) for t, cur in zip(Temperature, current)])
-        k_cyc_low_T_high_SOC_values = np.array([k_Cyc_Low_T_High_SOC(t, cur, soc) for t, cur, soc in zip(Temperature, current, SOC)])
-
-
-        # Calculate time intervals
-        time_intervals = np.diff(time, prepend = time[0])
-
-        phi_ch = np.cumsum(np.where(current > 0, current * time_intervals, 0)) + self.initial_phi_ch
-        phi_total = np.cumsum(np.abs(current * time_intervals)) + self.initial_phi_total
-
-        # Calculate integrands
-        integrand_cal = k_cal_values / np.where(time > 0, 2 * np.sqrt(time), 1e-1)
-        integrand_cyc1 = k_cyc_high_T_values / np.where(phi_total > 0, 2 * np.sqrt(phi_total), 1e-1)
-        integrand_cyc2 = k_cyc_low_T_values / np.where(phi_ch > 0, 2 * np.sqrt(phi_ch), 1e-1)
-        integrand_cyc3 = k_cyc_low_T_high_SOC_values
-
-        # Calculate losses
-        # self.cycle_losses = np.trapz(integrand_cal, x=time) + np.trapz(integrand_cyc1, x=phi_total) + np.trapz(integrand_cyc2, x=phi_ch) + np.trapz(integrand_cyc3, x=phi_ch)
-        self.cal_losses = np.trapz(integrand_cal, x=time)
-        self.cycle1_losses = np.trapz(integrand_cyc1, x=phi_total)
-        self.cycle2_losses = np.trapz(integrand_cyc2, x=phi_ch)
-        self.cycle3_losses = np.trapz(integrand_cyc3, x=phi_ch)
-        self.cycle_losses = self.cycle1_losses + self.cycle2_losses + self.cycle3_losses
-        self.total_losses = self.cal_losses + self.cycle_losses
-
-        # Update final values for this cycle
-        self.final_time = time
-        self.final_phi_ch = phi_ch
-        self.final_phi_total = phi_total
-
-        return
+from Aging_Model import k_all
+from Cycle_Engine import fast_forward, run_cycles
+from Temperature_Sweep import sweep_temperatures
+from Profile_Cache import load_profile
+from Profile_Compression import compress_profile
+from Closed_Loop import run_closed_loop
+from Engine_Profiling import StageProfiler, ProgressReporter
+from Plot_Decimation import plot_decimated
+from Result_Export import LossExporter
+from Checkpoint import Checkpointer
+
 # Load data
 file_path = "/Users/wsong/Library/CloudStorage/SynologyDrive-SamsungSTF/Data/Aging_Model/CRDR.csv"
-data = pd.read_csv(file_path)
-
-# Extract necessary columns and convert units
-time = data['Time (seconds)'].values / 3600  # Convert seconds to hours
-SOC = data['SOC'].values
-current = data['Current(mA)'].values / 1000  # Convert mA to A
 
 # Simulation settings
 num_cycles = 3000
 temperature_settings = [273.15, 298.15] # Temperatures: 0, 15, 25, 35, 45°C
-
-# making dictionary to store temperature losses
-temperature_losses = {temp: [] for temp in temperature_settings}
-cycle_1_losses = {temp: [] for temp in temperature_settings}
-cycle_2_losses = {temp: [] for temp in temperature_settings}
-cycle_3_losses = {temp: [] for temp in temperature_settings}
-
-cycle_numbers = np.arange(1, num_cycles + 1)
-temperature_calculation_times = {}
-
-data_by_temp = {
-    temp: {cycle: {'time': [], 'Q_cal' : [], 'Q_cycle1' : [], 'Q_cycle2' : [], 'Q_cycle3' : [], 'Q_total' : []} for cycle in range(1, num_cycles + 1)}
-    for temp in temperature_settings
-}
-
-# calculate losses for each temperature
-for temp in temperature_settings:
-    # start time
-    start_time = tm.time()
-    initial_time = 0
-    initial_phi_ch = 0
-    initial_phi_total = 0
-    cumulative_losses = []
-    cycle1_losses = []
-    cycle2_losses = []
-    cycle3_losses = []
-
-    for cycle in range(num_cycles):
-        cycle_data = CycleData(cycle, initial_time, initial_phi_ch, initial_phi_total)
-        Temperature = np.full(len(time), temp)
-        cycle_data.calculate_loss(time, current, Temperature, SOC)
-
-        # 온도별 손실을 저장합니다.
-        cumulative_losses.append(cycle_data.cycle_losses)
-        cycle1_losses.append(cycle_data.cycle1_losses)
-        cycle2_losses.append(cycle_data.cycle2_losses)
-        cycle3_losses.append(cycle_data.cycle3_losses)
-
-        print(f"Cycle {cycle}: Q_loss : {cycle_data.cycle_losses}")
-
-        # 온도별 사전에 각 사이클의 결과 추가
-        data_by_temp[temp][cycle + 1]['time'].append(cycle_data.final_time)
-
-        # 초기값을 업데이트합니다.
-        initial_time = cycle_data.final_time[-1]
-        initial_phi_ch = cycle_data.final_phi_ch[-1]
-        initial_phi_total = cycle_data.final_phi_total[-1]
-
-    # 누적 손실을 계산합니다.
-    temperature_losses[temp] = np.cumsum(cumulative_losses)
-    cycle_1_losses[temp] = np.cumsum(cycle1_losses)
-    cycle_2_losses[temp] = np.cumsum(cycle2_losses)
-    cycle_3_losses[temp] = np.cumsum(cycle3_losses)
-
-    # 끝나는 시간 기록
-    end_time = tm.time()  # 현재 시간(계산 완료 시간)을 기록합니다.
-    calculation_time = end_time - start_time  # 계산에 걸린 시간을 계산합니다.
-    temperature_calculation_times[temp] = calculation_time  # 계산 시간을 저장합니다.
-
-# 온도별 계산 시간을 출력합니다.
-for temp, calc_time in temperature_calculation_times.items():
-    print(f"Temperature {int(temp - 273.15)}°C: Calculation took {calc_time:.2f} seconds")
-
-plt.figure(figsize=(12, 12))
-
-# 각 온도별로 사이클 손실 그래프를 그립니다.
-for temp in temperature_settings:
-    cycle_nums = np.arange(1, num_cycles + 1)
-
-    # 각 사이클별 누적 손실값
-    Q_cycle1_cumulative_losses = cycle_1_losses[temp]
-    Q_cycle2_cumulative_losses = cycle_2_losses[temp]
-    Q_cycle3_cumulative_losses = cycle_3_losses[temp]
-    Q_cycle_cumulative_losses = temperature_losses[temp]
-
-    # Q_cycle1 손실 그래프
-    plt.subplot(2, 2, 1)
-    plt.plot(cycle_nums, Q_cycle1_cumulative_losses, label=f'Temp = {int(temp - 273.15)}°C')
-    plt.title('Q_cycle1 Cumulative Losses by Cycle')
-    plt.xlabel('Cycle Number')
-    plt.ylabel('Capacity Retention')
-    plt.legend()
-    plt.grid(True)
-
-    # Q_cycle2 손실 그래프
-    plt.subplot(2, 2, 2)
-    plt.plot(cycle_nums, Q_cycle2_cumulative_losses, label=f'Temp = {int(temp - 273.15)}°C')
-    plt.title('Q_cycle2 Cumulative Losses by Cycle')
-    plt.xlabel('Cycle Number')
-    plt.ylabel('Capacity Retention')
-    plt.legend()
-    plt.grid(True)
-
-    # Q_cycle3 손실 그래프
-    plt.subplot(2, 2, 3)
-    plt.plot(cycle_nums, Q_cycle3_cumulative_losses, label=f'Temp = {int(temp - 273.15)}°C')
-    plt.title('Q_cycle3 Cumulative Losses by Cycle')
-    plt.xlabel('Cycle Number')
-    plt.ylabel('Capacity Retention')
-    plt.legend()
-    plt.grid(True)
-
-    # Q_cycle3 손실 그래프
-    plt.subplot(2, 2, 4)
-    plt.plot(cycle_nums, Q_cycle3_cumulative_losses, label=f'Temp = {int(temp - 273.15)}°C')
-    plt.title('Pure Cycling Losses')
-    plt.xlabel('Cycle Number')
-    plt.ylabel('Capacity Retention')
-    plt.legend()
-    plt.grid(True)
-
-plt.tight_layout()
-plt.show()
-
-# 각 온도에 대한 그래프 그리기
-for temp in temperature_settings:
-    # k 값 계산
-    k_cal_values = np.array([k_Cal(t, soc) for t, soc in zip(np.full(len(time), temp), SOC)])
-    k_cyc_high_T_values = np.array([k_Cyc_High_T(temp) for _ in time])
-    k_cyc_low_T_current_values = np.array([k_Cyc_Low_T_Current(temp, cur) for cur in current])
-    k_cyc_low_T_high_SOC_values = np.array([k_Cyc_Low_T_High_SOC(temp, cur, soc) for cur, soc in zip(current, SOC)])
-
-    # 그래프 그리기
-    plt.figure(figsize=(10, 6))
-    plt.plot(time, k_cal_values, label='k_Cal')
-    plt.plot(time, k_cyc_high_T_values, label='k_Cyc_High_T')
-    plt.plot(time, k_cyc_low_T_current_values, label='k_Cyc_Low_T_Current')
-    plt.plot(time, k_cyc_low_T_high_SOC_values, label='k_Cyc_Low_T_High_SOC')
-
-    plt.title(f'k Values Over Time at {temp - 273.15}°C')
-    plt.xlabel('Time (hours)')
-    plt.ylabel('k Values')
-    plt.legend()
-    plt.grid(True)
-    plt.show()
\ No newline at end of file
+engine_mode = 'sweep'  # 'sweep': all temperatures in one array computation, 'fast_forward': cycle invariants computed once per temperature, 'loop': one CycleData per cycle, 'closed_loop': SOC re-derived each cycle from the faded capacity
+integrator = 'trapz'  # 'product': exact 1/sqrt(x) weights, converges at much coarser sampling than 'trapz'
+keep_trajectory_every = 500  # loop mode: keep the full time/phi arrays of every 500th cycle only
+profile_stages = False  # True: time per engine stage (rates, phi, integrands, integrate, bookkeeping)
+progress_interval = 5.0  # seconds between progress lines in the cycle loops
+compression_tolerance = None  # e.g. 1e-4: merge near-constant samples, losses up to num_cycles within 1e-4 relative
+export_path = None  # e.g. 'losses.parquet', 'losses.h5' or a directory: append every run's per-cycle losses
+export_scenario = 'CRDR'  # scenario id of this run's rows in the export
+checkpoint_dir = None  # e.g. 'checkpoints': loop / closed_loop runs save their state there and resume after a crash
+checkpoint_every = 1000  # cycles between checkpoints
+checkpoint_seconds = 300  # and at least every 300 seconds
+
+
+# Runs the configured study on file_path and plots it; importing the module has no side effects
+def main():
+    import matplotlib.pyplot as plt
+
+    # Memory-mapped arrays already converted to hours / A (binary sidecar rebuilt when the CSV changes)
+    time, current, SOC = load_profile(file_path)
+
+    if compression_tolerance:
+        (time, current, SOC), report = compress_profile(time, current, SOC, compression_tolerance, temperature_settings, integrator,
+                                                        num_cycles=num_cycles)
+        print(f"Profile compressed {report['samples']} -> {report['compressed_samples']} samples "
+              f"({report['ratio']:.1f}x, loss error {report['error']:.1e})")
+
+    # making dictionary to store temperature losses
+    temperature_losses = {temp: [] for temp in temperature_settings}
+    cycle_1_losses = {temp: [] for temp in temperature_settings}
+    cycle_2_losses = {temp: [] for temp in temperature_settings}
+    cycle_3_losses = {temp: [] for temp in temperature_settings}
+
+    cycle_numbers = np.arange(1, num_cycles + 1)
+    temperature_calculation_times = {}
+
+    profiler = StageProfiler() if profile_stages else None
+    exporter = LossExporter(export_path) if export_path else None
+    checkpoints = {temp: Checkpointer(os.path.join(checkpoint_dir, f'{engine_mode}_{temp:.2f}K.npz'), checkpoint_every, checkpoint_seconds)
+                   for temp in temperature_settings} if checkpoint_dir else {}
+
+    # evaluate every temperature at once as a (temperature x sample) computation
+    sweep_rows = {}
+    if engine_mode == 'sweep':
+        start_time = tm.time()
+        sweep = sweep_temperatures(time, current, SOC, temperature_settings, num_cycles, integrator=integrator, profiler=profiler)
+        sweep_rows = dict(zip(temperature_settings, sweep))
+        print(f"Sweep over {len(temperature_settings)} temperatures took {tm.time() - start_time:.2f} seconds")
+
+    # calculate losses for each temperature
+    for temp in temperature_settings:
+        # start time
+        start_time = tm.time()
+        if engine_mode == 'sweep':
+            temperature_losses[temp] = sweep_rows[temp]['Q_cycle_cumulative']
+            cycle_1_losses[temp] = sweep_rows[temp]['Q_cycle1_cumulative']
+            cycle_2_losses[temp] = sweep_rows[temp]['Q_cycle2_cumulative']
+            cycle_3_losses[temp] = sweep_rows[temp]['Q_cycle3_cumulative']
+            per_cycle = {key: sweep_rows[temp][key] for key in sweep_rows[temp].dtype.names}
+        elif engine_mode == 'fast_forward':
+            result = fast_forward(time, current, temp, SOC, num_cycles, profiler=profiler, integrator=integrator)
+            temperature_losses[temp] = result['cumulative']['Q_cycle']
+            cycle_1_losses[temp] = result['cumulative']['Q_cycle1']
+            cycle_2_losses[temp] = result['cumulative']['Q_cycle2']
+            cycle_3_losses[temp] = result['cumulative']['Q_cycle3']
+            per_cycle = result['per_cycle']
+        elif engine_mode == 'closed_loop':
+            progress = ProgressReporter(num_cycles, progress_interval, label=f"{temp - 273.15:.0f}°C cycle")
+            result = run_closed_loop(time, current, temp, SOC, num_cycles, integrator=integrator, profiler=profiler, progress=progress,
+                                     checkpoint=checkpoints.get(temp))
+            temperature_losses[temp] = result['cumulative']['Q_cycle']
+            cycle_1_losses[temp] = result['cumulative']['Q_cycle1']
+            cycle_2_losses[temp] = result['cumulative']['Q_cycle2']
+            cycle_3_losses[temp] = result['cumulative']['Q_cycle3']
+            completed = result['completed_cycles']
+            per_cycle = {key: values[:completed] for key, values in result['per_cycle'].items()}
+            print(f"Temperature {temp - 273.15:.0f}°C: capacity {result['capacity'][0]:.3f} -> {result['capacity'][completed - 1]:.3f} Ah after {completed} cycles")
+        else:
+            progress = ProgressReporter(num_cycles, progress_interval, label=f"{temp - 273.15:.0f}°C cycle")
+            # 한 사이클씩 계산하며, checkpoint_dir가 있으면 중단된 지점부터 이어서 계산합니다.
+            result = run_cycles(time, current, np.full(len(time), temp), SOC, num_cycles, integrator, keep_every=keep_trajectory_every,
+                                profiler=profiler, progress=progress, checkpoint=checkpoints.get(temp))
+            temperature_losses[temp] = result['cumulative']['Q_cycle']
+            cycle_1_losses[temp] = result['cumulative']['Q_cycle1']
+            cycle_2_losses[temp] = result['cumulative']['Q_cycle2']
+            cycle_3_losses[temp] = result['cumulative']['Q_cycle3']
+            per_cycle = result['per_cycle']
+
+        # 끝나는 시간 기록
+        end_time = tm.time()  # 현재 시간(계산 완료 시간)을 기록합니다.
+        calculation_time = end_time - start_time  # 계산에 걸린 시간을 계산합니다.
+        temperature_calculation_times[temp] = calculation_time  # 계산 시간을 저장합니다.
+
+        # 사이클별 손실을 결과 저장소에 추가합니다.
+        if exporter is not None:
+            exporter.append(export_scenario, temp, per_cycle)
+
+    if exporter is not None:
+        exporter.close()
+
+    # 온도별 계산 시간을 출력합니다.
+    for temp, calc_time in temperature_calculation_times.items():
+        print(f"Temperature {int(temp - 273.15)}°C: Calculation took {calc_time:.2f} seconds")
+    if profiler is not None:
+        print(profiler.format_report())
+    for temp, checkpoint in checkpoints.items():
+        report = checkpoint.report()
+        print(f"{temp - 273.15:.0f}°C checkpoints: {report['saves']} saves, {report['seconds']:.2f} s, {report['bytes'] / 1e6:.1f} MB")
+
+    plt.figure(figsize=(12, 12))
+
+    # 각 온도별로 사이클 손실 그래프를 그립니다.
+    for temp in temperature_settings:
+        cycle_nums = np.arange(1, num_cycles + 1)
+
+        # 각 사이클별 누적 손실값
+        Q_cycle1_cumulative_losses = cycle_1_losses[temp]
+        Q_cycle2_cumulative_losses = cycle_2_losses[temp]
+        Q_cycle3_cumulative_losses = cycle_3_losses[temp]
+        Q_cycle_cumulative_losses = temperature_losses[temp]
+
+        # Q_cycle1 손실 그래프
+        plt.subplot(2, 2, 1)
+        plot_decimated(plt.gca(), cycle_nums, Q_cycle1_cumulative_losses, label=f'Temp = {int(temp - 273.15)}°C')
+        plt.title('Q_cycle1 Cumulative Losses by Cycle')
+        plt.xlabel('Cycle Number')
+        plt.ylabel('Capacity Retention')
+        plt.legend()
+        plt.grid(True)
+
+        # Q_cycle2 손실 그래프
+        plt.subplot(2, 2, 2)
+        plot_decimated(plt.gca(), cycle_nums, Q_cycle2_cumulative_losses, label=f'Temp = {int(temp - 273.15)}°C')
+        plt.title('Q_cycle2 Cumulative Losses by Cycle')
+        plt.xlabel('Cycle Number')
+        plt.ylabel('Capacity Retention')
+        plt.legend()
+        plt.grid(True)
+
+        # Q_cycle3 손실 그래프
+        plt.subplot(2, 2, 3)
+        plot_decimated(plt.gca(), cycle_nums, Q_cycle3_cumulative_losses, label=f'Temp = {int(temp - 273.15)}°C')
+        plt.title('Q_cycle3 Cumulative Losses by Cycle')
+        plt.xlabel('Cycle Number')
+        plt.ylabel('Capacity Retention')
+        plt.legend()
+        plt.grid(True)
+
+        # Q_cycle3 손실 그래프
+        plt.subplot(2, 2, 4)
+        plot_decimated(plt.gca(), cycle_nums, Q_cycle3_cumulative_losses, label=f'Temp = {int(temp - 273.15)}°C')
+        plt.title('Pure Cycling Losses')
+        plt.xlabel('Cycle Number')
+        plt.ylabel('Capacity Retention')
+        plt.legend()
+        plt.grid(True)
+
+    plt.tight_layout()
+    plt.show()
+
+    # 각 온도에 대한 그래프 그리기
+    for temp in temperature_settings:
+        # k 값 계산
+        k_cal_values, k_cyc_high_T_values, k_cyc_low_T_current_values, k_cyc_low_T_high_SOC_values = k_all(temp, current, SOC)
+
+        # 그래프 그리기
+        plt.figure(figsize=(10, 6))
+        plot_decimated(plt.gca(), time, k_cal_values, label='k_Cal')
+        plot_decimated(plt.gca(), time, k_cyc_high_T_values, label='k_Cyc_High_T')
+        plot_decimated(plt.gca(), time, k_cyc_low_T_current_values, label='k_Cyc_Low_T_Current')
+        plot_decimated(plt.gca(), time, k_cyc_low_T_high_SOC_values, label='k_Cyc_Low_T_High_SOC')
+
+        plt.title(f'k Values Over Time at {temp - 273.15}°C')
+        plt.xlabel('Time (hours)')
+        plt.ylabel('k Values')
+        plt.legend()
+        plt.grid(True)
+        plt.show()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+from collections import namedtuple
+
+import numpy as np
+from Aging_Model import k_all
+from Cycle_Engine import _check_integrator, linear_increments, root_increments
+from Cycle_Results import LOSS_KEYS
+
+# Ragged per-cell profiles packed CSR-style: the samples of cell i are
+# time[offsets[i]:offsets[i + 1]] (h), current (A), SOC (%) and Temperature (K) likewise.
+FleetProfiles = namedtuple('FleetProfiles', ['time', 'current', 'SOC', 'Temperature', 'offsets'])
+
+
+# profiles: iterable of (time [h], current [A], SOC [%], Temperature [K]) per cell; Temperature may be
+# a scalar (constant for the cell) or a per-sample array
+def pack_profiles(profiles):
+    columns = {'time': [], 'current': [], 'SOC': [], 'Temperature': []}
+    lengths = []
+    for time, current, SOC, Temperature in profiles:
+        time = np.asarray(time, dtype=float)
+        columns['time'].append(time)
+        columns['current'].append(np.broadcast_to(np.asarray(current, dtype=float), time.shape))
+        columns['SOC'].append(np.broadcast_to(np.asarray(SOC, dtype=float), time.shape))
+        columns['Temperature'].append(np.broadcast_to(np.asarray(Temperature, dtype=float), time.shape))
+        lengths.append(len(time))
+    offsets = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+    flat = {name: np.concatenate(values) if values else np.empty(0) for name, values in columns.items()}
+    return FleetProfiles(flat['time'], flat['current'], flat['SOC'], flat['Temperature'], offsets)
+
+
+def segmented_cumsum(values, segment_ids, starts):
+    # Cumulative sum restarting at every segment; starts[i] is the first index of segment i
+    totals = np.cumsum(values)
+    base = totals[starts] - values[starts]
+    return totals - base[segment_ids]
+
+
+def _evaluate_block(time, current, SOC, Temperature, offsets, initial_time, initial_phi_ch, initial_phi_total,
+                    integrator, zero_denominator):
+    # CycleData.calculate_loss for every cell of one block at once
+    num_cells = len(offsets) - 1
+    lengths = np.diff(offsets)
+    segment_ids = np.repeat(np.arange(num_cells), lengths)
+    starts = offsets[:-1][lengths > 0]
+
+    time_intervals = np.diff(time, prepend=time[:1])
+    time_intervals[starts] = 0
+    charge = current * time_intervals
+    time = time + initial_time[segment_ids]
+    phi_ch = segmented_cumsum(np.where(current > 0, charge, 0), segment_ids, starts) + initial_phi_ch[segment_ids]
+    phi_total = segmented_cumsum(np.abs(charge), segment_ids, starts) + initial_phi_total[segment_ids]
+
+    k_cal_values, k_cyc_high_T_values, k_cyc_low_T_values, k_cyc_low_T_high_SOC_values = k_all(Temperature, current, SOC)
+
+    # intervals that join two cells are dropped before the per-cell reduction
+    interval_ids = segment_ids[1:]
+    inside = interval_ids == segment_ids[:-1]
+
+    def per_cell(increments):
+        return np.bincount(interval_ids[inside], weights=increments[inside], minlength=num_cells)
+
+    losses = {
+        'Q_cal': per_cell(root_increments(time, k_cal_values, integrator, zero_denominator)),
+        'Q_cycle1': per_cell(root_increments(phi_total, k_cyc_high_T_values, integrator, zero_denominator)),
+        'Q_cycle2': per_cell(root_increments(phi_ch, k_cyc_low_T_values, integrator, zero_denominator)),
+        'Q_cycle3': per_cell(linear_increments(phi_ch, k_cyc_low_T_high_SOC_values, integrator)),
+    }
+
+    # end state per cell; an empty cell keeps its initial state
+    last = np.maximum(offsets[1:] - 1, 0)
+    empty = lengths == 0
+    if len(time):
+        losses['final_time'] = np.where(empty, initial_time, time[last])
+        losses['final_phi_ch'] = np.where(empty, initial_phi_ch, phi_ch[last])
+        losses['final_phi_total'] = np.where(empty, initial_phi_total, phi_total[last])
+    else:
+        losses['final_time'], losses['final_phi_ch'], losses['final_phi_total'] = initial_time, initial_phi_ch, initial_phi_total
+    return losses
+
+
+# Per-cell loss breakdown of a packed fleet, with the CycleData.calculate_loss math applied to each
+# cell's own profile. initial_time / initial_phi_ch / initial_phi_total (scalars or one value per
+# cell) place each profile in the cell's life, e.g. the final_* values of the previous day's run.
+# Cells are processed in blocks of about block_samples samples so the temporaries stay bounded; within
+# a block there is no per-cell Python work (segmented cumulative sums and bincount reductions).
+# Returns LOSS_KEYS plus final_time / final_phi_ch / final_phi_total, one entry per cell.
+def evaluate_fleet(fleet, integrator='trapz', initial_time=0, initial_phi_ch=0, initial_phi_total=0,
+                   block_samples=1 << 20, zero_denominator=1e-1):
+    _check_integrator(integrator)
+    offsets = np.asarray(fleet.offsets, dtype=np.int64)
+    num_cells = len(offsets) - 1
+    initial_time, initial_phi_ch, initial_phi_total = (
+        np.broadcast_to(np.asarray(values, dtype=float), (num_cells,))
+        for values in (initial_time, initial_phi_ch, initial_phi_total))
+
+    result = {key: np.zeros(num_cells) for key in ('Q_cal', 'Q_cycle1', 'Q_cycle2', 'Q_cycle3',
+                                                   'final_time', 'final_phi_ch', 'final_phi_total')}
+    first = 0
+    while first < num_cells:
+        # as many whole cells as fit in block_samples, at least one
+        last = int(np.searchsorted(offsets, offsets[first] + block_samples, side='right')) - 1
+        last = min(max(last, first + 1), num_cells)
+        low, high = offsets[first], offsets[last]
+        block = _evaluate_block(fleet.time[low:high], fleet.current[low:high], fleet.SOC[low:high],
+                                fleet.Temperature[low:high], offsets[first:last + 1] - low,
+                                initial_time[first:last], initial_phi_ch[first:last], initial_phi_total[first:last],
+                                integrator, zero_denominator)
+        for key, values in block.items():
+            result[key][first:last] = values
+        first = last
+
+    result['Q_cycle'] = result['Q_cycle1'] + result['Q_cycle2'] + result['Q_cycle3']
+    result['Q_total'] = result['Q_cal'] + result['Q_cycle']
+    return {key: result[key] for key in LOSS_KEYS + ('final_time', 'final_phi_ch', 'final_phi_total')}
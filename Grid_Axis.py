@@ -0,0 +1,24 @@
+import numpy as np
+
+
+class Axis:
+    # Sorted grid axis; uniform axes locate values arithmetically instead of by binary search
+    def __init__(self, nodes):
+        self.nodes = np.asarray(nodes, dtype=float)
+        self.size = len(self.nodes)
+        steps = np.diff(self.nodes)
+        self.uniform = self.size > 1 and np.allclose(steps, steps[0], rtol=1e-12, atol=0)
+        self.inverse_step = 1 / steps[0] if self.uniform else None
+
+    def locate(self, values):
+        # lower node index and interpolation weight, clamped to the ends of the axis
+        values = np.asarray(values, dtype=float)
+        if self.size == 1:
+            return np.zeros(values.shape, dtype=np.intp), np.zeros(values.shape)
+        if self.uniform:
+            position = np.clip((values - self.nodes[0]) * self.inverse_step, 0, self.size - 1)
+            index = np.minimum(position.astype(np.intp), self.size - 2)
+            return index, position - index
+        values = np.clip(values, self.nodes[0], self.nodes[-1])
+        index = np.clip(np.searchsorted(self.nodes, values, side='right') - 1, 0, self.size - 2)
+        return index, (values - self.nodes[index]) / (self.nodes[index + 1] - self.nodes[index])
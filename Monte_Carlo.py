@@ -0,0 +1,79 @@
+from functools import partial
+
+import numpy as np
+
+import Aging_Model
+from Cycle_Engine import CycleProfile
+from End_Of_Life import cycles_to_threshold
+
+# Log-normal spread (standard deviation of log(value)) of the uncertain Table IV constants
+DEFAULT_SPREAD = {
+    'k_Cal_Ref': 0.2, 'k_Cyc_High_T_Ref': 0.2, 'k_Cyc_Low_T_Ref': 0.2, 'k_Cyc_Low_T_High_SOC_Ref': 0.2,
+    'Ea_Cal': 0.05, 'Ea_Cyc_High_T': 0.05, 'Ea_Cyc_Low_T': 0.05, 'Ea_Cyc_Low_T_High_SOC': 0.05,
+}
+PERCENTILES = (2.5, 25, 50, 75, 97.5)
+# A cumulative_losses entry costs about as much as 15 per-cycle losses, so grids with at least one
+# requested cycle in DENSE_CYCLES are summed cycle by cycle
+DENSE_CYCLES = 16
+
+
+# num_draws parameter sets {name: (num_draws,)}, each parameter log-normal around its current
+# Aging_Model value with the given spread (a {name: sigma} mapping or one sigma for every name).
+def draw_parameters(num_draws, spread=None, seed=0, names=None):
+    if spread is None:
+        spread = DEFAULT_SPREAD
+    if not isinstance(spread, dict):
+        spread = {name: spread for name in (names or DEFAULT_SPREAD)}
+    values = Aging_Model.get_parameters()
+    unknown = set(spread) - set(values)
+    if unknown:
+        raise KeyError(f"Unknown aging model parameters: {sorted(unknown)}")
+    rng = np.random.default_rng(seed)
+    return {name: values[name] * np.exp(sigma * rng.standard_normal(num_draws)) for name, sigma in spread.items()}
+
+
+# Capacity-retention bands over the parameter draws for one repeated cycle profile
+# (time [h], current [A], SOC [%]) at a constant Temperature (K).
+# Draws are evaluated chunk_size at a time as the leading axis of one CycleProfile (k_all params of
+# shape (chunk, 1)), so peak memory grows with chunk_size x samples and chunk_size x len(cycles), not
+# with the number of draws. Retention 1 - Q_total is kept per draw at `cycles` (1-based, default
+# every cycle up to num_cycles; pass a coarser grid to shrink the draws x cycles result).
+# cycles to threshold (0.8 = 80 % retention) is searched per draw up to max_cycles (inf beyond).
+# Returns {'cycle', 'percentiles', 'retention_bands' (percentiles x cycles), 'retention_mean',
+#          'retention' (draws x cycles), 'cycles_to_threshold' (draws,),
+#          'cycles_to_threshold_percentiles', 'parameters'}.
+def propagate(profile, Temperature, num_cycles, draws, cycles=None, percentiles=PERCENTILES, threshold=0.8,
+              max_cycles=10 ** 7, chunk_size=256, **options):
+    base_time, current, SOC = (np.asarray(values, dtype=float) for values in profile)
+    Temperature = float(Temperature)
+    draws = {name: np.asarray(values, dtype=float) for name, values in draws.items()}
+    num_draws = len(next(iter(draws.values())))
+    cycles = np.arange(1, num_cycles + 1) if cycles is None else np.asarray(cycles, dtype=np.int64)
+    retention = np.empty((num_draws, len(cycles)))
+    to_threshold = np.empty(num_draws)
+
+    for start in range(0, num_draws, chunk_size):
+        stop = min(start + chunk_size, num_draws)
+        rate_function = partial(Aging_Model.k_all, params={name: values[start:stop, None] for name, values in draws.items()})
+        cycle_profile = CycleProfile(base_time, current, Temperature, SOC, rate_function=rate_function, **options)
+        if cycles.max() <= DENSE_CYCLES * len(cycles):
+            # dense grid: every cycle's loss up to the last requested one, summed
+            per_cycle = cycle_profile.losses(np.arange(cycles.max()))['Q_total']
+            accumulated = np.broadcast_to(np.cumsum(per_cycle, axis=-1), (stop - start, per_cycle.shape[-1]))[:, cycles - 1]
+        else:
+            # sparse grid: the accumulated loss at the requested cycles only, however late they are
+            accumulated = cycle_profile.cumulative_losses(np.broadcast_to(cycles, (stop - start, len(cycles))))['Q_total']
+        retention[start:stop] = 1 - accumulated
+        # the same profile, searched with one operating point per draw row
+        to_threshold[start:stop] = cycles_to_threshold(cycle_profile, None, threshold, max_cycles=max_cycles)
+
+    return {
+        'cycle': cycles,
+        'percentiles': np.asarray(percentiles, dtype=float),
+        'retention_bands': np.percentile(retention, percentiles, axis=0),
+        'retention_mean': retention.mean(axis=0),
+        'retention': retention,
+        'cycles_to_threshold': to_threshold,
+        'cycles_to_threshold_percentiles': np.percentile(to_threshold, percentiles),
+        'parameters': draws,
+    }
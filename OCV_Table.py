@@ -0,0 +1,156 @@
+import os
+
+import numpy as np
+
+from Grid_Axis import Axis
+
+BRANCHES = ('charge', 'discharge', 'mean')
+# Cycler CSV column measured on the same (unscaled) voltage scale as an OCV test
+CYCLER_VOLTAGE_COLUMN = 'Voltage(V)'
+
+
+# Pool-adjacent-violators fit: the non-decreasing sequence closest to values in weighted least squares
+def _isotonic(values, weights):
+    means = []
+    totals = []
+    counts = []
+    for value, weight in zip(values, weights):
+        means.append(value)
+        totals.append(weight)
+        counts.append(1)
+        while len(means) > 1 and means[-2] > means[-1]:
+            weight = totals[-2] + totals[-1]
+            means[-2] = (means[-2] * totals[-2] + means[-1] * totals[-1]) / weight
+            totals[-2] = weight
+            counts[-2] += counts[-1]
+            del means[-1], totals[-1], counts[-1]
+    return np.repeat(means, counts)
+
+
+# Monotone OCV(SOC) of one branch on the SOC grid: repeated SOC points are averaged (weighted by
+# their count), the result is made non-decreasing and interpolated linearly onto the grid
+def _monotone_branch(SOC, voltage, grid):
+    order = np.argsort(SOC, kind='stable')
+    unique_SOC, inverse, counts = np.unique(SOC[order], return_inverse=True, return_counts=True)
+    mean_voltage = np.bincount(inverse, weights=voltage[order]) / counts
+    return np.interp(grid, unique_SOC, _isotonic(mean_voltage, counts))
+
+
+# Rows recorded while SOC rises (charge) or falls (discharge); rows where SOC does not change take the
+# direction of the row before them
+def _branch_masks(SOC):
+    step = np.sign(np.diff(SOC, prepend=SOC[0]))
+    moving = np.flatnonzero(step)
+    if len(moving) == 0:
+        return np.ones(len(SOC), dtype=bool), np.zeros(len(SOC), dtype=bool)
+    filled = step[moving[np.maximum(np.searchsorted(moving, np.arange(len(SOC)), side='right') - 1, 0)]]
+    return filled > 0, filled < 0
+
+
+class OCVTable:
+    # OCV-SOC table on a uniform SOC grid (%) with one monotone voltage curve per branch: 'charge' and
+    # 'discharge' when the measurement has both directions (hysteresis), 'mean' halfway between them.
+    # SOC -> OCV locates the grid cell arithmetically; OCV -> SOC binary searches (searchsorted) the
+    # branch voltages, where a flat stretch (equal voltages, e.g. the LFP plateau) maps to its middle.
+    # Both lookups are vectorised and clamp to the ends of the table.
+    # cycler_column names the cycler CSV column whose voltages are on the table's scale, i.e. the one
+    # to read rest voltages from (the raw voltage, not the rescaled 'Scaled Voltage(V)').
+    def __init__(self, SOC, branches, cycler_column=CYCLER_VOLTAGE_COLUMN):
+        self.SOC = np.asarray(SOC, dtype=float)
+        self.cycler_column = cycler_column
+        self.branches = {name: np.asarray(values, dtype=float) for name, values in branches.items()}
+        if 'mean' not in self.branches:
+            self.branches['mean'] = (self.branches['charge'] + self.branches['discharge']) / 2
+        self._SOC_axis = Axis(self.SOC)
+        self._voltage_axes = {}
+        for name, voltage in self.branches.items():
+            nodes, first, counts = np.unique(voltage, return_index=True, return_counts=True)
+            self._voltage_axes[name] = (Axis(nodes), (self.SOC[first] + self.SOC[first + counts - 1]) / 2)
+
+    @property
+    def has_hysteresis(self):
+        return 'charge' in self.branches
+
+    def _branch(self, branch):
+        if branch not in BRANCHES:
+            raise ValueError(f"Unknown OCV branch {branch!r}; expected one of {BRANCHES}")
+        return branch if branch in self.branches else 'mean'
+
+    def ocv(self, SOC, branch='mean'):
+        voltage = self.branches[self._branch(branch)]
+        index, weight = self._SOC_axis.locate(SOC)
+        return voltage[index] * (1 - weight) + voltage[np.minimum(index + 1, len(voltage) - 1)] * weight
+
+    def soc(self, voltage, branch='mean'):
+        axis, SOC = self._voltage_axes[self._branch(branch)]
+        index, weight = axis.locate(voltage)
+        return SOC[index] * (1 - weight) + SOC[np.minimum(index + 1, len(SOC) - 1)] * weight
+
+    @property
+    def voltage_range(self):
+        return (min(float(voltage[0]) for voltage in self.branches.values()),
+                max(float(voltage[-1]) for voltage in self.branches.values()))
+
+    def hysteresis(self, SOC):
+        # charge - discharge OCV gap (V); zero for a single-branch table
+        if not self.has_hysteresis:
+            return np.zeros(np.shape(SOC))
+        return self.ocv(SOC, 'charge') - self.ocv(SOC, 'discharge')
+
+    # Builds the table from an OCV test CSV (voltage and SOC given as column positions or names, as
+    # in OCV_SOC.py). Both branches are kept when each direction has at least min_branch_rows rows.
+    @classmethod
+    def from_csv(cls, csv_path, voltage_column=2, SOC_column=3, resolution=0.1, min_branch_rows=10,
+                 cycler_column=CYCLER_VOLTAGE_COLUMN):
+        import pandas as pd
+        data = pd.read_csv(csv_path)
+        voltage = (data.iloc[:, voltage_column] if isinstance(voltage_column, int) else data[voltage_column]).to_numpy(dtype=float)
+        SOC = (data.iloc[:, SOC_column] if isinstance(SOC_column, int) else data[SOC_column]).to_numpy(dtype=float)
+        valid = np.isfinite(voltage) & np.isfinite(SOC)
+        voltage, SOC = voltage[valid], SOC[valid]
+
+        grid = np.linspace(SOC.min(), SOC.max(), int(round((SOC.max() - SOC.min()) / resolution)) + 1)
+        charge, discharge = _branch_masks(SOC)
+        if charge.sum() >= min_branch_rows and discharge.sum() >= min_branch_rows:
+            branches = {'charge': _monotone_branch(SOC[charge], voltage[charge], grid),
+                        'discharge': _monotone_branch(SOC[discharge], voltage[discharge], grid)}
+        else:
+            branches = {'mean': _monotone_branch(SOC, voltage, grid)}
+        return cls(grid, branches, cycler_column)
+
+    def save(self, path, **metadata):
+        temporary = path + '.tmp.npz'
+        np.savez(temporary, SOC=self.SOC, cycler_column=self.cycler_column,
+                 **{f'branch_{name}': values for name, values in self.branches.items()},
+                 **{f'meta_{name}': value for name, value in metadata.items()})
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as stored:
+            branches = {name[len('branch_'):]: stored[name] for name in stored.files if name.startswith('branch_')}
+            cycler_column = str(stored['cycler_column']) if 'cycler_column' in stored.files else CYCLER_VOLTAGE_COLUMN
+            return cls(stored['SOC'], branches, cycler_column)
+
+
+def cache_path_for(csv_path):
+    return csv_path + '.ocv.npz'
+
+
+# OCVTable of an OCV test CSV, built once and kept as a binary .npz next to it; rebuilt when the CSV's
+# size or modification time changes (or the build options differ)
+def load_table(csv_path, cache_path=None, **options):
+    cache_path = cache_path or cache_path_for(csv_path)
+    stat = os.stat(csv_path)
+    source = np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+    try:
+        with np.load(cache_path) as stored:
+            current = (np.array_equal(stored['meta_source'], source)
+                       and str(stored['meta_options']) == repr(sorted(options.items())))
+        if current:
+            return OCVTable.load(cache_path)
+    except (OSError, ValueError, KeyError):
+        pass
+    table = OCVTable.from_csv(csv_path, **options)
+    table.save(cache_path, source=source, options=repr(sorted(options.items())))
+    return table
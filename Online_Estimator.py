@@ -0,0 +1,142 @@
+from math import sqrt
+import numpy as np
+from Aging_Model import k_all, k_all_scalar
+from Cycle_Engine import _check_integrator, linear_increments, root_increments
+
+STATE_KEYS = ('elapsed_time', 'phi_ch', 'phi_total', 'last_timestamp', 'last_k',
+              'Q_cal', 'Q_cycle1', 'Q_cycle2', 'Q_cycle3')
+
+
+class OnlineAgingEstimator:
+    # Incremental version of CycleData.calculate_loss for live telemetry: samples (timestamp,
+    # current [A], SOC [%], Temperature [K]) are consumed one at a time or in chunks, and only the
+    # last sample (elapsed time, phi_ch, phi_total, the four k values) and the four accumulated
+    # losses are kept, so the state is O(1) however long the stream runs.
+    # timestamps are multiplied by time_scale to get hours (default: timestamps in seconds).
+    # phi and the integrals follow CycleData exactly: feeding a profile in any chunking gives the
+    # CycleData losses of that profile up to rounding.
+    # update() handles one sample with plain floats; update_chunk() is vectorised and is the faster
+    # of the two from a few dozen samples per chunk on.
+    def __init__(self, integrator='trapz', time_scale=1 / 3600, initial_time=0, initial_phi_ch=0,
+                 initial_phi_total=0, zero_denominator=1e-1):
+        _check_integrator(integrator)
+        self.integrator = integrator
+        self._root_increment = {'analytic': self._analytic_increment, 'product': self._product_increment,
+                                'trapz': self._trapz_increment}[integrator]
+        self.time_scale = time_scale
+        self.zero_denominator = zero_denominator
+        self.elapsed_time = float(initial_time)
+        self.phi_ch = float(initial_phi_ch)
+        self.phi_total = float(initial_phi_total)
+        self.last_timestamp = None
+        self.last_k = None
+        self.Q_cal = 0.0
+        self.Q_cycle1 = 0.0
+        self.Q_cycle2 = 0.0
+        self.Q_cycle3 = 0.0
+
+    def update(self, timestamp, current, SOC, Temperature):
+        # Per-sample hot path: plain floats and locals only, the rule of the integrator is bound once
+        # in __init__ (_root_increment)
+        current = float(current)
+        k_values = k_all_scalar(float(Temperature), current, float(SOC))
+
+        last_timestamp = self.last_timestamp
+        time_interval = 0.0 if last_timestamp is None else (timestamp - last_timestamp) * self.time_scale
+        charge = current * time_interval
+        time_start = self.elapsed_time
+        phi_total_start = self.phi_total
+        phi_ch_start = self.phi_ch
+        time_end = time_start + time_interval
+        phi_total_end = phi_total_start + abs(charge)
+        phi_ch_end = phi_ch_start + charge if current > 0 else phi_ch_start
+
+        last_k = self.last_k
+        if last_k is not None:
+            root_increment = self._root_increment
+            self.Q_cal += root_increment(time_start, time_end, last_k[0], k_values[0])
+            self.Q_cycle1 += root_increment(phi_total_start, phi_total_end, last_k[1], k_values[1])
+            self.Q_cycle2 += root_increment(phi_ch_start, phi_ch_end, last_k[2], k_values[2])
+            if self.integrator == 'analytic':
+                self.Q_cycle3 += last_k[3] * (phi_ch_end - phi_ch_start)
+            else:
+                self.Q_cycle3 += (k_values[3] + last_k[3]) / 2 * (phi_ch_end - phi_ch_start)
+
+        self.elapsed_time = time_end
+        self.phi_total = phi_total_end
+        self.phi_ch = phi_ch_end
+        self.last_timestamp = timestamp
+        self.last_k = k_values
+        return self.losses()
+
+    # Integral of k / (2 sqrt(x)) from x0 to x1 per integrator, same rules as the update_chunk path
+    def _analytic_increment(self, x0, x1, k0, k1):
+        denominator = sqrt(x1 if x1 > 0 else 0.0) + sqrt(x0 if x0 > 0 else 0.0)
+        return k0 * (x1 - x0) / denominator if denominator > 0 else 0.0
+
+    def _product_increment(self, x0, x1, k0, k1):
+        left = sqrt(x0 if x0 > 0 else 0.0)
+        right = sqrt(x1 if x1 > 0 else 0.0)
+        denominator = 3 * (left + right) ** 2
+        return (x1 - x0) * (k0 * (left + 2 * right) + k1 * (2 * left + right)) / denominator if denominator > 0 else 0.0
+
+    def _trapz_increment(self, x0, x1, k0, k1):
+        f0 = k0 / (2 * sqrt(x0) if x0 > 0 else self.zero_denominator)
+        f1 = k1 / (2 * sqrt(x1) if x1 > 0 else self.zero_denominator)
+        return (f1 + f0) / 2 * (x1 - x0)
+
+    def update_chunk(self, timestamps, current, SOC, Temperature):
+        timestamps = np.asarray(timestamps, dtype=float)
+        if timestamps.size == 0:
+            return self.losses()
+        current = np.asarray(current, dtype=float)
+        k_values = np.array(k_all(Temperature, current, SOC))  # (4, n): k_cal, k_cyc_high_T, k_cyc_low_T, k_cyc_low_T_high_SOC
+
+        # Same phi definition as CycleData: current of each sample times the interval before it
+        previous_timestamp = timestamps[0] if self.last_timestamp is None else self.last_timestamp
+        time_intervals = np.diff(timestamps, prepend=previous_timestamp) * self.time_scale
+        charge = current * time_intervals
+        time = self.elapsed_time + np.cumsum(time_intervals)
+        phi_ch = self.phi_ch + np.cumsum(np.where(current > 0, charge, 0))
+        phi_total = self.phi_total + np.cumsum(np.abs(charge))
+
+        # Integration variable of each loss component: time, phi_total, phi_ch, phi_ch
+        x = np.array([time, phi_total, phi_ch, phi_ch])
+        if self.last_k is not None:
+            # the last sample of the previous chunk opens the first interval of this one
+            x = np.concatenate([[[self.elapsed_time], [self.phi_total], [self.phi_ch], [self.phi_ch]], x], axis=1)
+            k_values = np.concatenate([np.asarray(self.last_k)[:, None], k_values], axis=1)
+
+        if x.shape[1] > 1:
+            increments = np.empty(4)
+            increments[:3] = root_increments(x[:3], k_values[:3], self.integrator, self.zero_denominator).sum(axis=1)
+            increments[3] = linear_increments(x[3], k_values[3], self.integrator).sum()
+            self.Q_cal += float(increments[0])
+            self.Q_cycle1 += float(increments[1])
+            self.Q_cycle2 += float(increments[2])
+            self.Q_cycle3 += float(increments[3])
+
+        self.elapsed_time = float(time[-1])
+        self.phi_ch = float(phi_ch[-1])
+        self.phi_total = float(phi_total[-1])
+        self.last_timestamp = float(timestamps[-1])
+        self.last_k = k_values[:, -1].tolist()
+        return self.losses()
+
+    def losses(self):
+        Q_cycle = self.Q_cycle1 + self.Q_cycle2 + self.Q_cycle3
+        return {'Q_cal': self.Q_cal, 'Q_cycle1': self.Q_cycle1, 'Q_cycle2': self.Q_cycle2, 'Q_cycle3': self.Q_cycle3,
+                'Q_cycle': Q_cycle, 'Q_total': self.Q_cal + Q_cycle}
+
+    # The complete state as plain Python values, so one estimator can be multiplexed over many
+    # cells (restore cell A, update, snapshot, restore cell B, ...) or the state stored anywhere.
+    def snapshot(self):
+        state = {key: getattr(self, key) for key in STATE_KEYS}
+        state['last_k'] = None if self.last_k is None else list(self.last_k)
+        return state
+
+    def restore(self, state):
+        for key in STATE_KEYS:
+            setattr(self, key, state[key])
+        self.last_k = None if state['last_k'] is None else list(state['last_k'])
+        return self
@@ -0,0 +1,117 @@
+import numpy as np
+
+BLOCK = 1024  # samples per precomputed min/max block
+READ_BLOCKS = 4096  # blocks read per step while building the block level
+
+
+# argmin / argmax along the last axis, skipping NaN (gaps such as unfinished closed-loop cycles)
+def _extremes(values):
+    missing = np.isnan(values)
+    if not missing.any():
+        return values.argmin(axis=-1), values.argmax(axis=-1)
+    return np.where(missing, np.inf, values).argmin(axis=-1), np.where(missing, -np.inf, values).argmax(axis=-1)
+
+
+class DecimatedSeries:
+    # Pixel-resolution view of a long series: for every output bucket the first, minimum, maximum and
+    # last sample are kept, which draws the same line as the full data at that width (every spike and
+    # plateau edge survives). x must be sorted; x and y may be memory-mapped, only the samples needed
+    # for a view are read.
+    # The minimum / maximum of every BLOCK samples are computed once (streamed READ_BLOCKS blocks at a
+    # time). Views with many blocks per bucket are served from them, closer zooms from the raw
+    # samples, so the cost of a redraw stays proportional to the pixel width at any zoom level.
+    def __init__(self, x, y, block=BLOCK):
+        self.x = x
+        self.y = y
+        self.block = block
+        num_blocks = len(y) // block
+        self.block_min = np.empty(num_blocks, dtype=np.int64)
+        self.block_max = np.empty(num_blocks, dtype=np.int64)
+        step = READ_BLOCKS
+        for first in range(0, num_blocks, step):
+            last = min(first + step, num_blocks)
+            values = np.asarray(y[first * block:last * block]).reshape(last - first, block)
+            offsets = np.arange(first, last) * block
+            low, high = _extremes(values)
+            self.block_min[first:last] = offsets + low
+            self.block_max[first:last] = offsets + high
+        self.block_min_value = np.asarray(y[self.block_min])
+        self.block_max_value = np.asarray(y[self.block_max])
+
+    def _raw_indices(self, start, stop, buckets):
+        count = stop - start
+        per_bucket = -(-count // buckets)
+        values = np.asarray(self.y[start:stop])
+        padded = np.concatenate([values, np.full(-count % per_bucket, values[-1])]).reshape(-1, per_bucket)
+        offsets = start + np.arange(len(padded)) * per_bucket
+        low, high = _extremes(padded)
+        return [offsets, offsets + low, offsets + high,
+                np.minimum(offsets + per_bucket, stop) - 1]
+
+    def _block_indices(self, start, stop, buckets):
+        # whole blocks inside [start, stop) from the block level, the partial blocks at both ends raw
+        first_block = -(-start // self.block)
+        last_block = stop // self.block
+        per_bucket = -(-(last_block - first_block) // buckets)
+        groups = np.arange(first_block, last_block, per_bucket)
+        minima = np.fmin.reduceat(self.block_min_value[first_block:last_block], groups - first_block)
+        maxima = np.fmax.reduceat(self.block_max_value[first_block:last_block], groups - first_block)
+        group_of_block = np.repeat(np.arange(len(groups)), np.diff(np.append(groups, last_block)))
+        block_range = slice(first_block, last_block)
+        at_min = np.flatnonzero(self.block_min_value[block_range] == minima[group_of_block])
+        at_max = np.flatnonzero(self.block_max_value[block_range] == maxima[group_of_block])
+        # first block per group reaching the group extreme
+        min_index = self.block_min[block_range][at_min[np.unique(group_of_block[at_min], return_index=True)[1]]]
+        max_index = self.block_max[block_range][at_max[np.unique(group_of_block[at_max], return_index=True)[1]]]
+        indices = [groups * self.block, np.minimum(groups + per_bucket, last_block) * self.block - 1, min_index, max_index]
+        for edge_start, edge_stop in ((start, first_block * self.block), (last_block * self.block, stop)):
+            if edge_stop > edge_start:
+                indices += self._raw_indices(edge_start, edge_stop, 1)
+        return indices
+
+    def indices(self, x_min=None, x_max=None, buckets=2000):
+        # sorted sample indices to draw for the x range [x_min, x_max] at `buckets` pixel columns,
+        # including one sample beyond each end so the line runs to the axis edges
+        size = len(self.y)
+        start = 0 if x_min is None else max(int(np.searchsorted(self.x, x_min, side='right')) - 1, 0)
+        stop = size if x_max is None else min(int(np.searchsorted(self.x, x_max, side='left')) + 1, size)
+        if stop - start <= 4 * buckets:
+            return np.arange(start, stop)
+        if (stop - start) // buckets >= 2 * self.block:
+            parts = self._block_indices(start, stop, buckets)
+        else:
+            parts = self._raw_indices(start, stop, buckets)
+        return np.unique(np.concatenate(parts + [[start, stop - 1]]))
+
+    def view(self, x_min=None, x_max=None, buckets=2000):
+        index = self.indices(x_min, x_max, buckets)
+        return np.asarray(self.x[index]), np.asarray(self.y[index])
+
+
+class DecimatedLine:
+    # Matplotlib line that shows a DecimatedSeries at the axes' pixel width and re-decimates whenever
+    # the x limits change (zoom, pan, twin axes sharing x). x_scale / y_scale convert units on the
+    # drawn points only (e.g. hours -> seconds), so memory-mapped data is never copied.
+    def __init__(self, ax, x, y, x_scale=1, y_scale=1, block=BLOCK, **plot_options):
+        self.ax = ax
+        self.series = DecimatedSeries(x, y, block)
+        self.x_scale = x_scale
+        self.y_scale = y_scale
+        x_view, y_view = self.series.view(buckets=self._buckets())
+        self.line, = ax.plot(x_view * x_scale, y_view * y_scale, **plot_options)
+        # a plain function is held strongly by the callback registry (bound methods only weakly), which
+        # keeps the line updating without the caller holding on to this object
+        ax.callbacks.connect('xlim_changed', lambda ax: self._update(ax))
+
+    def _buckets(self):
+        return max(int(self.ax.get_window_extent().width), 100)
+
+    def _update(self, ax):
+        x_min, x_max = ax.get_xlim()
+        x_view, y_view = self.series.view(x_min / self.x_scale, x_max / self.x_scale, self._buckets())
+        self.line.set_data(x_view * self.x_scale, y_view * self.y_scale)
+
+
+# ax.plot replacement for long series: plot_decimated(ax, time, current, color='tab:red')
+def plot_decimated(ax, x, y, **options):
+    return DecimatedLine(ax, x, y, **options)
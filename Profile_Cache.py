@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+
+# One cycle of a load profile in engine units: time [h], current [A], SOC [%]
+Profile = namedtuple('Profile', ['time', 'current', 'SOC'])
+
+# CRDR.csv column -> (cached array name, unit conversion factor)
+PROFILE_COLUMNS = {
+    'Time (seconds)': ('time', 1 / 3600),  # seconds to hours
+    'Current(mA)': ('current', 1 / 1000),  # mA to A
+    'SOC': ('SOC', 1),
+    'Scaled Voltage(V)': ('voltage', 1),
+}
+
+META_FILE = 'meta.json'
+
+
+def cache_dir_for(csv_path):
+    return csv_path + '.cache'
+
+
+def file_hash(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_meta(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, META_FILE)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _is_current(meta, csv_path, validate):
+    if meta is None:
+        return False
+    stat = os.stat(csv_path)
+    if validate == 'hash':
+        return meta['sha256'] == file_hash(csv_path)
+    return meta['size'] == stat.st_size and meta['mtime_ns'] == stat.st_mtime_ns
+
+
+def _build_cache(csv_path, cache_dir):
+    # pandas is only needed to parse the CSV, not to map an existing sidecar
+    import pandas as pd
+
+    # the CSV is read before anything is created, so a missing or unreadable file leaves no sidecar
+    stat = os.stat(csv_path)
+    header = pd.read_csv(csv_path, nrows=0).columns
+    columns = [column for column in PROFILE_COLUMNS if column in header]
+    data = pd.read_csv(csv_path, usecols=columns)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    meta_path = os.path.join(cache_dir, META_FILE)
+    # meta.json is written last and marks a complete cache; drop it before touching the arrays
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    arrays = []
+    for column in columns:
+        name, factor = PROFILE_COLUMNS[column]
+        values = data[column].to_numpy(dtype=float) * factor
+        temporary = os.path.join(cache_dir, f'{name}.tmp.npy')
+        np.save(temporary, values)
+        os.replace(temporary, os.path.join(cache_dir, f'{name}.npy'))
+        arrays.append(name)
+
+    meta = {'source': os.path.abspath(csv_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'sha256': file_hash(csv_path), 'rows': len(data), 'arrays': arrays}
+    temporary = meta_path + '.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(meta, file, indent=2)
+    os.replace(temporary, meta_path)
+    return meta
+
+
+# Memory-mapped arrays of a profile CSV, converted to engine units. A binary sidecar (one .npy per
+# column next to the CSV) is written on first use and rebuilt whenever the CSV changes; with
+# validate='mtime' a change means a different size or modification time, with validate='hash' a
+# different SHA-256 of the contents.
+def load_arrays(csv_path, validate='mtime', cache_dir=None):
+    cache_dir = cache_dir or cache_dir_for(csv_path)
+    meta = _read_meta(cache_dir)
+    if not _is_current(meta, csv_path, validate):
+        meta = _build_cache(csv_path, cache_dir)
+    return {name: np.load(os.path.join(cache_dir, f'{name}.npy'), mmap_mode='r') for name in meta['arrays']}
+
+
+def load_profile(csv_path, validate='mtime', cache_dir=None):
+    arrays = load_arrays(csv_path, validate, cache_dir)
+    return Profile(arrays['time'], arrays['current'], arrays['SOC'])
+
+
+# SHA-256 of the profile CSV as recorded in its sidecar (builds the sidecar if needed)
+def profile_hash(csv_path, validate='mtime', cache_dir=None):
+    cache_dir = cache_dir or cache_dir_for(csv_path)
+    load_arrays(csv_path, validate, cache_dir)
+    return _read_meta(cache_dir)['sha256']
@@ -0,0 +1,111 @@
+import numpy as np
+import Aging_Model
+from Cycle_Engine import CycleProfile
+from Cycle_Results import LOSS_KEYS
+from Profile_Cache import Profile
+
+
+def _log_breaks(values, ratio):
+    # True before every sample whose value lies in a different bucket of width log(1 + ratio) in
+    # log(value) than the previous sample; zero is a bucket of its own
+    with np.errstate(divide='ignore'):
+        buckets = np.where(values > 0, np.floor(np.log(np.maximum(values, 1e-300)) / np.log1p(ratio)), -np.inf)
+    return buckets[1:] != buckets[:-1]
+
+
+# Indices of the samples kept at a given resolution: within a merged interval no rate k may change by
+# more than a factor (1 + resolution) and time, phi_ch and phi_total may not grow by more than that
+# factor (the steep part of the 1/sqrt(x) terms near zero keeps its samples). The rate ratios between
+# samples do not depend on temperature, so they are taken at T_Ref.
+# Where the current changes sign, SOC crosses SOC_Ref (k_Cyc_Low_T_High_SOC steps) or x leaves zero
+# the interval across the change is kept as it is, i.e. the samples on both sides are kept.
+def _kept_samples(time, current, SOC, resolution):
+    time_intervals = np.diff(time, prepend=time[0])
+    phi_ch = np.cumsum(np.where(current > 0, current * time_intervals, 0))
+    phi_total = np.cumsum(np.abs(current * time_intervals))
+    k_cal_values, _, k_cyc_low_T_values, k_cyc_low_T_high_SOC_values = Aging_Model.k_all(Aging_Model.T_Ref, current, SOC)
+
+    steps = ((np.sign(current[1:]) != np.sign(current[:-1]))
+             | ((SOC[1:] >= Aging_Model.SOC_Ref) != (SOC[:-1] >= Aging_Model.SOC_Ref)))
+    # the first interval leaving x = 0 carries the zero_denominator term of the trapezoid rule
+    for x in (time - time[0], phi_ch, phi_total):
+        steps |= (x[:-1] <= 0) & (x[1:] > 0)
+    breaks = (steps
+              | np.concatenate([[False], steps[:-1]])
+              | _log_breaks(k_cal_values, resolution)
+              | _log_breaks(k_cyc_low_T_values, resolution)
+              | _log_breaks(k_cyc_low_T_high_SOC_values, resolution)
+              | _log_breaks(time - time[0], resolution)
+              | _log_breaks(phi_ch, resolution)
+              | _log_breaks(phi_total, resolution))
+    # a break before sample i closes the segment ending at i - 1
+    ends = np.flatnonzero(breaks)
+    return np.unique(np.concatenate([[0], ends, [len(time) - 1]]))
+
+
+# Merges the samples between kept ones into one interval. The current of a kept sample is the mean
+# current of the intervals it replaces (charge / duration), so time, phi_ch and phi_total are exact at
+# every kept sample; SOC is the value of the kept sample.
+def _merge(time, current, SOC, kept):
+    charge = current * np.diff(time, prepend=time[0])
+    charge_to = np.concatenate([[0], np.cumsum(charge)])[kept + 1]
+    duration = np.diff(time[kept])
+    merged_current = current[kept].copy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_current = np.diff(charge_to) / duration
+    merged_current[1:] = np.where(duration > 0, mean_current, current[kept[1:]])
+    return Profile(time[kept], merged_current, SOC[kept])
+
+
+def _relative_error(reference, candidate):
+    errors = []
+    for key in LOSS_KEYS:
+        scale = np.abs(reference[key])
+        errors.append(np.where(scale > 0, np.abs(candidate[key] - reference[key]) / np.where(scale > 0, scale, 1),
+                               np.abs(candidate[key])))
+    return float(np.max(errors))
+
+
+# Loss components the compression bound is checked on, per temperature: the per-cycle losses of the
+# first check_cycles cycles (where the 1/sqrt(x) terms are steepest) and of cycle num_cycles (late
+# life, where time and phi carry large offsets), plus the losses accumulated over num_cycles cycles
+def _checked_losses(time, current, SOC, Temperature, integrator, check_cycles, num_cycles):
+    profile = CycleProfile(time, current, Temperature, SOC, integrator=integrator)
+    per_cycle = profile.losses(np.unique(np.append(np.arange(check_cycles), num_cycles - 1)))
+    accumulated = profile.cumulative_losses(np.full(Temperature.shape, num_cycles))
+    return {key: np.concatenate([per_cycle[key], accumulated[key]], axis=-1) for key in LOSS_KEYS}
+
+
+# Reduces a CRDR-style profile (time [h], current [A], SOC [%]) to fewer samples with a bound on the
+# loss error: at every temperature in Temperature (K) the loss components of the first check_cycles
+# cycles, of cycle num_cycles and accumulated over num_cycles cycles (_checked_losses) must agree with
+# the uncompressed profile to within tolerance (relative); pass the run's cycle count as num_cycles.
+# The resolution starts at initial_resolution and is halved until the bound holds; if it never does
+# above min_resolution the profile is returned unchanged.
+# The ratio depends on the data: finely sampled, smooth segments (constant-current / constant-voltage
+# steps logged at sub-second intervals) merge by 10x or more, while noisy current or SOC (every sample
+# moving k or the log buckets) leaves most samples in place and gives ratios close to 1.
+# Returns (Profile, report) with report = {'samples', 'compressed_samples', 'ratio', 'error', 'resolution'}.
+def compress_profile(time, current, SOC, tolerance=1e-4, Temperature=(Aging_Model.T_Ref,), integrator='trapz',
+                     check_cycles=2, num_cycles=1000, initial_resolution=0.5, min_resolution=1e-6):
+    time = np.asarray(time, dtype=float)
+    current = np.asarray(current, dtype=float)
+    SOC = np.asarray(SOC, dtype=float)
+    Temperature = np.atleast_1d(np.asarray(Temperature, dtype=float))[:, None]
+    reference = _checked_losses(time, current, SOC, Temperature, integrator, check_cycles, num_cycles)
+
+    resolution = initial_resolution
+    while resolution >= min_resolution:
+        compressed = _merge(time, current, SOC, _kept_samples(time, current, SOC, resolution))
+        candidate = _checked_losses(compressed.time, compressed.current, compressed.SOC, Temperature, integrator,
+                                    check_cycles, num_cycles)
+        error = _relative_error(reference, candidate)
+        if error <= tolerance:
+            break
+        resolution /= 2
+    else:
+        compressed, error, resolution = Profile(time, current, SOC), 0.0, 0.0
+
+    report = {'samples': len(time), 'compressed_samples': len(compressed.time),
+              'ratio': len(time) / len(compressed.time), 'error': error, 'resolution': resolution}
+    return compressed, report
@@ -0,0 +1,73 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import Aging_Model
+
+RATE_NAMES = ('k_cal', 'k_cyc_high_T', 'k_cyc_low_T', 'k_cyc_low_T_high_SOC')
+AXES = ('T', 'SOC', 'I_Ch')
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.rate_cache')
+
+
+# The four rates on a (T [K], SOC [%], I_Ch [A]) grid, each of shape (len(T), len(SOC), len(I_Ch)),
+# computed by broadcasting k_all over the axes. 'k_cyc_low_T_high_SOC_active' is
+# k_Cyc_Low_T_High_SOC without its SOC >= SOC_Ref step (it does not depend on SOC otherwise).
+def rate_grid(T, SOC, I_Ch):
+    T, SOC, I_Ch = (np.asarray(values, dtype=float) for values in (T, SOC, I_Ch))
+    grid = {'T': T, 'SOC': SOC, 'I_Ch': I_Ch}
+    rates = Aging_Model.k_all(T[:, None, None], I_Ch[None, None, :], SOC[None, :, None])
+    grid.update(zip(RATE_NAMES, rates))
+    grid['k_cyc_low_T_high_SOC_active'] = np.broadcast_to(
+        Aging_Model.k_all(T[:, None, None], I_Ch[None, None, :], Aging_Model.SOC_Ref)[3], rates[3].shape).copy()
+    return grid
+
+
+def grid_key(T, SOC, I_Ch):
+    # Table IV parameters and grid axes -> cache key
+    digest = hashlib.sha256(json.dumps(Aging_Model.get_parameters(), sort_keys=True).encode())
+    for values in (T, SOC, I_Ch):
+        values = np.ascontiguousarray(values, dtype=float)
+        digest.update(str(values.shape).encode())
+        digest.update(values.tobytes())
+    return digest.hexdigest()
+
+
+# rate_grid, stored as one .npz per (parameters, axes) key under cache_dir and reused on later calls
+def cached_rate_grid(T, SOC, I_Ch, cache_dir=DEFAULT_CACHE_DIR):
+    path = os.path.join(cache_dir, f'rates-{grid_key(T, SOC, I_Ch)[:32]}.npz')
+    try:
+        with np.load(path) as stored:
+            return {name: stored[name] for name in stored.files}
+    except (OSError, ValueError):
+        pass
+    grid = rate_grid(T, SOC, I_Ch)
+    os.makedirs(cache_dir, exist_ok=True)
+    temporary = path + '.tmp.npz'
+    np.savez(temporary, **grid)
+    os.replace(temporary, path)
+    return grid
+
+
+class ProfileRates:
+    # rate_function that evaluates the wrapped one (k_all by default) once per profile: the rates of
+    # the last (T, I_Ch, SOC) it was called with are returned again as long as the same objects are
+    # passed, which the cycle loops do every cycle (run_cycles wraps its rate_function in it). On a
+    # 86k-sample profile this removes the 'rates' stage, more than half of a loop-mode cycle.
+    # Inputs are matched by identity, so they must not be modified in place between calls; the cached
+    # rates are read-only.
+    def __init__(self, rate_function=Aging_Model.k_all):
+        self.rate_function = rate_function
+        self._inputs = None
+        self._rates = None
+
+    def __call__(self, T, I_Ch, SOC):
+        inputs = (T, I_Ch, SOC)
+        if self._inputs is None or any(value is not cached for value, cached in zip(inputs, self._inputs)):
+            rates = tuple(np.asarray(rate) for rate in self.rate_function(T, I_Ch, SOC))
+            for rate in rates:
+                rate.flags.writeable = False
+            self._inputs = inputs
+            self._rates = rates
+        return self._rates
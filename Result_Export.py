@@ -0,0 +1,253 @@
+import glob
+import json
+import os
+import time as tm
+import uuid
+
+import numpy as np
+
+# Exported per-cycle row: scenario code, temperature (K), 1-based cycle, loss breakdown and the
+# running total over the scenario / temperature
+EXPORT_COLUMNS = (('scenario', np.int32), ('temperature', np.float64), ('cycle', np.int64),
+                  ('Q_cal', np.float64), ('Q_cycle1', np.float64), ('Q_cycle2', np.float64),
+                  ('Q_cycle3', np.float64), ('Q_total', np.float64), ('Q_total_cumulative', np.float64))
+LOSS_COLUMNS = ('Q_cal', 'Q_cycle1', 'Q_cycle2', 'Q_cycle3', 'Q_total')
+# on-disk dtypes of the raw column files, little-endian whatever the machine
+FILE_DTYPES = {name: np.dtype(dtype).newbyteorder('<') for name, dtype in EXPORT_COLUMNS}
+
+META_FILE = 'meta.json'
+SCENARIO_FILE = 'scenarios.json'
+
+
+def _write_json(path, values):
+    temporary = path + '.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(values, file, indent=2)
+    os.replace(temporary, path)
+
+
+def _read_json(path, default):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return default
+
+
+def export_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.parquet':
+        return 'parquet'
+    if extension in ('.h5', '.hdf5'):
+        return 'hdf5'
+    return 'columns'
+
+
+def _file_dtypes(meta):
+    # dtypes of an existing directory as recorded in its meta.json (FILE_DTYPES for a new one)
+    if not meta or 'columns' not in meta:
+        return dict(FILE_DTYPES)
+    return {name: np.dtype(meta['columns'].get(name, FILE_DTYPES[name])) for name in FILE_DTYPES}
+
+
+class _ColumnFiles:
+    # Directory with one raw binary file per column, little-endian (FILE_DTYPES) and the dtypes
+    # recorded in meta.json, which also holds the committed row count, written after the column data:
+    # rows past it (an interrupted append) are cut off on the next open and never read
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        meta = _read_json(os.path.join(path, META_FILE), None)
+        self.rows = meta['rows'] if meta else 0
+        self.scenarios = meta['scenarios'] if meta else {}
+        # appends keep the byte order of an existing directory
+        self.dtypes = _file_dtypes(meta)
+        for name, dtype in self.dtypes.items():
+            column_path = os.path.join(path, f'{name}.bin')
+            with open(column_path, 'ab') as file:
+                file.truncate(self.rows * dtype.itemsize)
+
+    def write(self, columns):
+        for name, dtype in self.dtypes.items():
+            with open(os.path.join(self.path, f'{name}.bin'), 'ab') as file:
+                file.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+        self.rows += len(columns['cycle'])
+        self.save_scenarios(self.scenarios)
+
+    def save_scenarios(self, scenarios):
+        self.scenarios = scenarios
+        _write_json(os.path.join(self.path, META_FILE), {
+            'rows': self.rows, 'scenarios': scenarios,
+            'columns': {name: dtype.str for name, dtype in self.dtypes.items()}})
+
+    def close(self):
+        pass
+
+
+class _ParquetParts:
+    # Directory of Parquet files, one per writer session, each flush one row group (pyarrow). Part
+    # names start with the session's start time, so read_columns returns the rows in append order
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as error:
+            raise ImportError("Parquet export needs pyarrow (pip install pyarrow)") from error
+        self.pa = pa
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.scenarios = _read_json(os.path.join(path, SCENARIO_FILE), {})
+        self.schema = pa.schema([(name, pa.from_numpy_dtype(np.dtype(dtype))) for name, dtype in EXPORT_COLUMNS])
+        self.writer = pq.ParquetWriter(os.path.join(path, f'part-{tm.time_ns():020d}-{uuid.uuid4().hex[:8]}.parquet'), self.schema)
+
+    def write(self, columns):
+        self.writer.write_table(self.pa.table({name: columns[name] for name, _ in EXPORT_COLUMNS}, schema=self.schema))
+
+    def save_scenarios(self, scenarios):
+        self.scenarios = scenarios
+        _write_json(os.path.join(self.path, SCENARIO_FILE), scenarios)
+
+    def close(self):
+        self.writer.close()
+
+
+class _HDF5Table:
+    # One HDF5 file with a chunked, resizable dataset per column (h5py)
+    def __init__(self, path):
+        try:
+            import h5py
+        except ImportError as error:
+            raise ImportError("HDF5 export needs h5py (pip install h5py)") from error
+        self.file = h5py.File(path, 'a')
+        for name, dtype in EXPORT_COLUMNS:
+            if name not in self.file:
+                self.file.create_dataset(name, shape=(0,), maxshape=(None,), dtype=dtype, chunks=(1 << 16,), compression='lzf')
+        self.scenarios = json.loads(self.file.attrs.get('scenarios', '{}'))
+
+    def write(self, columns):
+        rows = len(columns['cycle'])
+        for name, _ in EXPORT_COLUMNS:
+            dataset = self.file[name]
+            dataset.resize((dataset.shape[0] + rows,))
+            dataset[-rows:] = columns[name]
+
+    def save_scenarios(self, scenarios):
+        self.scenarios = scenarios
+        self.file.attrs['scenarios'] = json.dumps(scenarios)
+
+    def close(self):
+        self.file.close()
+
+
+BACKENDS = {'columns': _ColumnFiles, 'parquet': _ParquetParts, 'hdf5': _HDF5Table}
+
+
+class LossExporter:
+    # Append-only columnar export of per-cycle loss breakdowns. Rows are collected in preallocated
+    # column buffers of buffer_rows rows and written as one batch whenever the buffer fills (and on
+    # flush / close), so memory stays bounded however long the study runs. An existing store is
+    # appended to. The format follows the path: '.parquet' (pyarrow, directory of row-grouped
+    # parts), '.h5' / '.hdf5' (h5py), anything else a directory of raw column files (numpy only).
+    # pyarrow and h5py are imported only when their format is used.
+    # Scenario ids are stored as integer codes; scenarios(path) maps the ids to them.
+    def __init__(self, path, format=None, buffer_rows=1 << 18):
+        self.store = BACKENDS[format or export_format(path)](path)
+        self.scenario_codes = dict(self.store.scenarios)
+        self.buffer = {name: np.empty(buffer_rows, dtype=dtype) for name, dtype in EXPORT_COLUMNS}
+        self.buffer_rows = buffer_rows
+        self.filled = 0
+        self.running_total = {}
+
+    def _code(self, scenario):
+        scenario = str(scenario)
+        if scenario not in self.scenario_codes:
+            self.scenario_codes[scenario] = len(self.scenario_codes)
+            self.store.save_scenarios(dict(self.scenario_codes))
+        return self.scenario_codes[scenario]
+
+    # Rows for cycles first_cycle, first_cycle + 1, ... of one scenario / temperature. per_cycle maps
+    # LOSS_COLUMNS to per-cycle values (arrays or scalars for a single cycle, e.g. CycleResultStore
+    # columns or an engine's 'per_cycle'). Successive calls for the same scenario and temperature
+    # continue its cumulative total, so a cycle loop may append one cycle at a time; initial_total
+    # sets the total carried in, e.g. when a resumed run continues a scenario of an earlier session.
+    def append(self, scenario, temperature, per_cycle, first_cycle=1, initial_total=None):
+        losses = {name: np.atleast_1d(np.asarray(per_cycle[name], dtype=float)) for name in LOSS_COLUMNS}
+        rows = len(losses['Q_total'])
+        code = self._code(scenario)
+        key = (code, float(temperature))
+        if initial_total is not None:
+            self.running_total[key] = initial_total
+        cumulative = self.running_total.get(key, 0.0) + np.cumsum(losses['Q_total'])
+        if rows:
+            self.running_total[key] = cumulative[-1]
+        columns = dict(losses, Q_total_cumulative=cumulative)
+
+        written = 0
+        while written < rows:
+            count = min(rows - written, self.buffer_rows - self.filled)
+            target = slice(self.filled, self.filled + count)
+            self.buffer['scenario'][target] = code
+            self.buffer['temperature'][target] = temperature
+            self.buffer['cycle'][target] = np.arange(first_cycle + written, first_cycle + written + count)
+            for name in LOSS_COLUMNS + ('Q_total_cumulative',):
+                self.buffer[name][target] = columns[name][written:written + count]
+            self.filled += count
+            written += count
+            if self.filled == self.buffer_rows:
+                self.flush()
+
+    def flush(self):
+        if self.filled:
+            self.store.write({name: values[:self.filled] for name, values in self.buffer.items()})
+            self.filled = 0
+
+    def close(self):
+        self.flush()
+        self.store.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def scenarios(path, format=None):
+    format = format or export_format(path)
+    if format == 'hdf5':
+        import h5py
+        with h5py.File(path, 'r') as file:
+            return json.loads(file.attrs.get('scenarios', '{}'))
+    if format == 'parquet':
+        return _read_json(os.path.join(path, SCENARIO_FILE), {})
+    return _read_json(os.path.join(path, META_FILE), {'scenarios': {}})['scenarios']
+
+
+# Selected columns of an export as {name: array} without loading the others; raw column files are
+# memory-mapped. scenario (an id) keeps only that scenario's rows.
+def read_columns(path, columns=None, scenario=None, format=None):
+    format = format or export_format(path)
+    names = list(columns or [name for name, _ in EXPORT_COLUMNS])
+    wanted = names + (['scenario'] if scenario is not None and 'scenario' not in names else [])
+    if format == 'parquet':
+        import pyarrow.parquet as pq
+        parts = sorted(glob.glob(os.path.join(path, 'part-*.parquet')))
+        tables = [pq.read_table(part, columns=wanted) for part in parts]
+        result = {name: np.concatenate([table.column(name).to_numpy() for table in tables]) if tables else
+                  np.empty(0, dtype=dict(EXPORT_COLUMNS)[name]) for name in wanted}
+    elif format == 'hdf5':
+        import h5py
+        with h5py.File(path, 'r') as file:
+            result = {name: file[name][()] for name in wanted}
+    else:
+        meta = _read_json(os.path.join(path, META_FILE), None)
+        rows = meta['rows'] if meta else 0
+        dtypes = _file_dtypes(meta)
+        result = {name: np.memmap(os.path.join(path, f'{name}.bin'), dtype=dtypes[name], mode='r', shape=(rows,))
+                  if rows else np.empty(0, dtype=dtypes[name]) for name in wanted}
+
+    if scenario is not None:
+        code = scenarios(path, format).get(str(scenario))
+        keep = result['scenario'] == code
+        result = {name: np.asarray(values)[keep] for name, values in result.items()}
+    return {name: result[name] for name in names}
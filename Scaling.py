@@ -1,22 +1,86 @@
-import pandas as pd
+import glob
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
 
 # 파일 경로
 file_path = '/Users/wsong/Downloads/CCCV_dcg.csv'
+output_file_path = '/Users/wsong/Downloads/Scaled_CCCV_dcg.csv'
 
-# 데이터 불러오기
-df = pd.read_csv(file_path)
-
-# 전압(Voltage)의 최소값과 최대값 확인
-min_voltage = df['Voltage(V)'].min()
-max_voltage = df['Voltage(V)'].max()
+VOLTAGE_COLUMN = 'Voltage(V)'
+SCALED_COLUMN = 'Scaled Voltage(V)'
 
 # 스케일링할 새로운 최소값과 최대값 설정
 new_min = 2.7
 new_max = 3.4
 
-# 선형 변환 적용하여 새로운 범위로 스케일링
-df['Scaled Voltage(V)'] = ((df['Voltage(V)'] - min_voltage) / (max_voltage - min_voltage)) * (new_max - new_min) + new_min
 
-# 결과를 새 파일로 저장
-output_file_path = '/Users/wsong/Downloads/Scaled_CCCV_dcg.csv'
-df.to_csv(output_file_path, index=False)
+# Pass 1 for one file: (min, max) of the voltage column, reading only that column chunksize rows at a time
+def voltage_range(path, chunksize=1_000_000):
+    import pandas as pd
+    low = float('inf')
+    high = float('-inf')
+    for chunk in pd.read_csv(path, usecols=[VOLTAGE_COLUMN], chunksize=chunksize):
+        low = min(low, float(chunk[VOLTAGE_COLUMN].min()))
+        high = max(high, float(chunk[VOLTAGE_COLUMN].max()))
+    return low, high
+
+
+# Pass 2 for one file: appends the linearly rescaled voltage ([min_voltage, max_voltage] ->
+# [new_min, new_max]) chunk by chunk. The output is written next to its final name and moved into
+# place when complete, so an interrupted run never leaves a truncated file behind.
+def scale_file(path, output_path, min_voltage, max_voltage, new_min=new_min, new_max=new_max, chunksize=1_000_000):
+    if not max_voltage > min_voltage:
+        raise ValueError(f"{path}: voltage range [{min_voltage}, {max_voltage}] cannot be rescaled")
+    import pandas as pd
+    factor = (new_max - new_min) / (max_voltage - min_voltage)
+    temporary = output_path + '.tmp'
+    header = True
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        # 선형 변환 적용하여 새로운 범위로 스케일링
+        chunk[SCALED_COLUMN] = (chunk[VOLTAGE_COLUMN] - min_voltage) * factor + new_min
+        chunk.to_csv(temporary, index=False, mode='w' if header else 'a', header=header)
+        header = False
+    os.replace(temporary, output_path)
+    return output_path
+
+
+def _map(function, arguments, max_workers):
+    if max_workers == 1:
+        return list(itertools.starmap(function, arguments))
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(function, *zip(*arguments)))
+
+
+# Two-pass scaling of many cycler CSVs with bounded memory: pass 1 reduces the voltage min/max over
+# chunks of every file, pass 2 rewrites each file with the scaled column. Both passes spread the files
+# over a process pool (max_workers=1 runs in-process). With shared_range the files share one
+# min/max (the whole batch is scaled together); otherwise each file uses its own, as a single-file
+# run does. Returns the output paths and the range(s) used.
+def scale_files(paths, output_paths, new_min=new_min, new_max=new_max, shared_range=True, chunksize=1_000_000,
+                max_workers=None):
+    paths = list(paths)
+    output_paths = list(output_paths)
+    if max_workers is None:
+        max_workers = min(os.cpu_count() or 1, max(len(paths), 1))
+
+    ranges = _map(voltage_range, [(path, chunksize) for path in paths], max_workers)
+    if shared_range and ranges:
+        ranges = [(min(low for low, _ in ranges), max(high for _, high in ranges))] * len(ranges)
+
+    arguments = [(path, output_path, low, high, new_min, new_max, chunksize)
+                 for path, output_path, (low, high) in zip(paths, output_paths, ranges)]
+    return {'outputs': _map(scale_file, arguments, max_workers), 'ranges': ranges}
+
+
+# scale_files for every file in input_dir matching pattern, written to output_dir as Scaled_<name>
+def scale_directory(input_dir, output_dir, pattern='*.csv', **options):
+    paths = sorted(glob.glob(os.path.join(input_dir, pattern)))
+    os.makedirs(output_dir, exist_ok=True)
+    output_paths = [os.path.join(output_dir, 'Scaled_' + os.path.basename(path)) for path in paths]
+    return scale_files(paths, output_paths, **options)
+
+
+if __name__ == '__main__':
+    scale_files([file_path], [output_file_path])
+    print("Data saved to:", output_file_path)
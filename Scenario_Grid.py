@@ -0,0 +1,99 @@
+import itertools
+import os
+import time as tm
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import shared_memory
+
+import numpy as np
+from Aging_Model import k_all
+from Cycle_Engine import fast_forward, run_cycles
+
+ENGINES = {'fast_forward': fast_forward, 'loop': run_cycles}
+
+
+# One scenario per combination, in itertools.product order:
+# profiles x temperatures (K) x cycle counts x parameter sets (Aging_Model overrides)
+def build_grid(profile_names, temperatures, cycle_counts, parameter_sets=({},)):
+    return [{'profile': name, 'temperature': float(temp), 'num_cycles': int(cycles), 'parameters': dict(parameters)}
+            for name, temp, cycles, parameters in itertools.product(profile_names, temperatures, cycle_counts, parameter_sets)]
+
+
+class SharedProfiles:
+    # Places each profile's (time, current, SOC) arrays in one shared memory block so worker
+    # processes map them instead of unpickling a copy per task.
+    def __init__(self, profiles):
+        self.blocks = {}
+        self.layout = {}
+        try:
+            for name, arrays in profiles.items():
+                stacked = np.vstack([np.asarray(values, dtype=float) for values in arrays])
+                block = shared_memory.SharedMemory(create=True, size=max(stacked.nbytes, 1))
+                np.ndarray(stacked.shape, dtype=float, buffer=block.buf)[:] = stacked
+                self.blocks[name] = block
+                self.layout[name] = (block.name, stacked.shape)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Worker-side views on the shared profiles, filled by the pool initializer
+_attached_blocks = {}
+_profiles = {}
+
+
+def _attach_profiles(layout):
+    for name, (block_name, shape) in layout.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _attached_blocks[name] = block
+        _profiles[name] = np.ndarray(shape, dtype=float, buffer=block.buf)
+
+
+def run_scenario(scenario, engine='fast_forward'):
+    start_time = tm.perf_counter()
+    base_time, current, SOC = _profiles[scenario['profile']]
+    # Table IV overrides go to k_all per call, so scenarios never touch the Aging_Model globals
+    parameters = scenario.get('parameters')
+    rate_function = partial(k_all, params=parameters) if parameters else k_all
+    result = ENGINES[engine](base_time, current, scenario['temperature'], SOC, scenario['num_cycles'],
+                             integrator=scenario.get('integrator', 'trapz'), rate_function=rate_function)
+    result['scenario'] = scenario
+    result['wall_time'] = tm.perf_counter() - start_time
+    return result
+
+
+# Runs every scenario on a process pool and returns the results in scenario order, independent of
+# the number of workers. profiles maps a profile name to its (time [h], current [A], SOC [%]) arrays.
+# max_workers=1 runs in-process without a pool.
+def run_grid(profiles, scenarios, max_workers=None, engine='fast_forward', chunksize=None):
+    scenarios = list(scenarios)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    if max_workers == 1:
+        _profiles.update({name: np.vstack([np.asarray(values, dtype=float) for values in arrays])
+                          for name, arrays in profiles.items()})
+        try:
+            return [run_scenario(scenario, engine) for scenario in scenarios]
+        finally:
+            _profiles.clear()
+
+    if chunksize is None:
+        chunksize = max(1, len(scenarios) // (4 * max_workers))
+
+    with SharedProfiles(profiles) as shared:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_attach_profiles,
+                                 initargs=(shared.layout,)) as pool:
+            return list(pool.map(run_scenario, scenarios, itertools.repeat(engine), chunksize=chunksize))
@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+import time as tm
+
+import numpy as np
+import Aging_Model
+from Cycle_Engine import INTEGRATORS
+from Profile_Cache import load_profile, profile_hash
+from Scenario_Grid import ENGINES, build_grid, run_grid
+
+# Bump when an engine change alters results, so every cached result is recomputed
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.scenario_cache')
+DEFAULT_MAX_BYTES = 1 << 30
+RESULT_KEYS = ('final_time', 'final_phi_ch', 'final_phi_total')
+
+
+# Study file (JSON, or TOML on Python 3.11+ / with tomli installed):
+#
+#   engine = "fast_forward"            # default engine and integrator of every scenario
+#   integrator = "trapz"
+#   [profiles]                         # name -> profile CSV, relative to the study file
+#   CRDR = "CRDR.csv"
+#   [grid]                             # every combination (Scenario_Grid.build_grid)
+#   profiles = ["CRDR"]                # default: all profiles
+#   temperatures = [273.15, 298.15]    # K
+#   num_cycles = [1000, 3000]
+#   parameters = [{}, {Ea_Cal = 2.1e4}]  # Aging_Model overrides, default: none
+#   [[scenarios]]                      # and / or single scenarios, which may set their own
+#   profile = "CRDR"                   # engine, integrator and parameters
+#   temperature = 308.15
+#   num_cycles = 500
+def load_study(path):
+    if os.path.splitext(path)[1].lower() == '.toml':
+        try:
+            import tomllib
+        except ImportError:
+            try:
+                import tomli as tomllib
+            except ImportError as error:
+                raise ImportError("TOML study files need Python 3.11+ or tomli (pip install tomli)") from error
+        with open(path, 'rb') as file:
+            study = tomllib.load(file)
+    else:
+        with open(path) as file:
+            study = json.load(file)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    study['profiles'] = {name: os.path.join(base_dir, profile_path) for name, profile_path in study.get('profiles', {}).items()}
+    return study
+
+
+# The study's scenarios in file order (grid first, then the single scenarios), each with profile,
+# temperature, num_cycles, parameters (overrides only), engine and integrator
+def expand_study(study):
+    defaults = {'engine': study.get('engine', 'fast_forward'), 'integrator': study.get('integrator', 'trapz')}
+    scenarios = []
+    grid = study.get('grid')
+    if grid:
+        scenarios += [dict(defaults, **scenario) for scenario in
+                      build_grid(grid.get('profiles', list(study['profiles'])), grid['temperatures'], grid['num_cycles'],
+                                 grid.get('parameters', [{}]))]
+    for scenario in study.get('scenarios', []):
+        scenarios.append(dict(defaults, profile=scenario['profile'], temperature=float(scenario['temperature']),
+                              num_cycles=int(scenario['num_cycles']), parameters=dict(scenario.get('parameters', {})),
+                              **{name: scenario[name] for name in defaults if name in scenario}))
+
+    for scenario in scenarios:
+        if scenario['profile'] not in study['profiles']:
+            raise KeyError(f"Scenario uses unknown profile {scenario['profile']!r}")
+        if scenario['engine'] not in ENGINES:
+            raise ValueError(f"Unknown engine {scenario['engine']!r}; expected one of {tuple(ENGINES)}")
+        if scenario['integrator'] not in INTEGRATORS:
+            raise ValueError(f"Unknown integrator {scenario['integrator']!r}; expected one of {INTEGRATORS}")
+        unknown = set(scenario['parameters']) - set(Aging_Model.PARAMETER_NAMES)
+        if unknown:
+            raise KeyError(f"Unknown aging model parameters: {sorted(unknown)}")
+    return scenarios
+
+
+# Cache key of a scenario: SHA-256 over everything its result depends on, i.e. the profile contents
+# (not its name or path), the full Table IV parameter set after the overrides, temperature, cycle
+# count, engine, integrator and CACHE_VERSION. Numbers are written as float reprs, so 21000 and
+# 2.1e4 give the same key while any change in value gives another.
+def scenario_key(scenario, profile_sha256):
+    resolved = {
+        'profile_sha256': profile_sha256,
+        'parameters': {name: float(value) for name, value in
+                       dict(Aging_Model.get_parameters(), **scenario['parameters']).items()},
+        'temperature': float(scenario['temperature']),
+        'num_cycles': int(scenario['num_cycles']),
+        'engine': scenario['engine'],
+        'integrator': scenario['integrator'],
+        'version': CACHE_VERSION,
+    }
+    return hashlib.sha256(json.dumps(resolved, sort_keys=True).encode()).hexdigest()
+
+
+class ResultCache:
+    # Finished scenario results, one <key>.npz per scenario holding the per-cycle losses and the final
+    # state. Files are written to a temporary name and moved into place, so a crash never leaves a
+    # partial result under a valid key. A hit refreshes the file's modification time; evict() removes
+    # the least recently used results until the directory holds at most max_bytes (None: unbounded).
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key}.npz')
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with np.load(path) as stored:
+                result = {'per_cycle': {name[len('per_cycle_'):]: stored[name] for name in stored.files
+                                        if name.startswith('per_cycle_')},
+                          **{name: stored[name][()] for name in RESULT_KEYS}}
+        except (OSError, ValueError, KeyError):
+            return None
+        os.utime(path)
+        return result
+
+    def put(self, key, result, scenario):
+        temporary = self.path(key) + '.tmp.npz'
+        np.savez(temporary, scenario=json.dumps(scenario, sort_keys=True),
+                 **{f'per_cycle_{name}': values for name, values in result['per_cycle'].items()},
+                 **{name: result[name] for name in RESULT_KEYS})
+        os.replace(temporary, self.path(key))
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npz') and not name.endswith('.tmp.npz'):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, name))
+        return sorted(entries)
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, keep=()):
+        # keep: keys that must stay (e.g. the results of the study that just ran)
+        if self.max_bytes is None:
+            return 0
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        keep = {f'{key}.npz' for key in keep}
+        removed = 0
+        for _, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            if name in keep:
+                continue
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+
+# Runs a study (a study file path or an already loaded dict) and returns one result per scenario, in
+# scenario order: {'scenario', 'key', 'cached', 'per_cycle', 'cumulative', 'final_time', ...}.
+# Scenarios whose key is in the cache are read back. Only the others are computed (Scenario_Grid.
+# run_grid on max_workers processes), and the same scenario listed twice is computed once. Each
+# profile is hashed once per run; its sidecar records the SHA-256, so unchanged CSVs are not re-read.
+# After the run the cache is trimmed to max_bytes, keeping this study's results.
+def run_study(study, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, max_workers=None, chunksize=None):
+    start_time = tm.perf_counter()
+    if isinstance(study, str):
+        study = load_study(study)
+    scenarios = expand_study(study)
+    cache = ResultCache(cache_dir, max_bytes)
+
+    profile_hashes = {name: profile_hash(study['profiles'][name]) for name in {scenario['profile'] for scenario in scenarios}}
+    keys = [scenario_key(scenario, profile_hashes[scenario['profile']]) for scenario in scenarios]
+
+    results = {}
+    missing = {}
+    for key, scenario in zip(keys, scenarios):
+        if key in results or key in missing:
+            continue
+        cached = cache.get(key)
+        if cached is None:
+            missing[key] = scenario
+        else:
+            results[key] = dict(cached, cached=True)
+
+    for engine in sorted({scenario['engine'] for scenario in missing.values()}):
+        engine_keys = [key for key, scenario in missing.items() if scenario['engine'] == engine]
+        names = {missing[key]['profile'] for key in engine_keys}
+        profiles = {name: load_profile(study['profiles'][name]) for name in names}
+        computed = run_grid(profiles, [missing[key] for key in engine_keys], max_workers, engine, chunksize)
+        for key, result in zip(engine_keys, computed):
+            cache.put(key, result, missing[key])
+            results[key] = {'per_cycle': result['per_cycle'], 'cached': False,
+                            **{name: result[name] for name in RESULT_KEYS}}
+    evicted = cache.evict(keep=keys)
+
+    output = []
+    for key, scenario in zip(keys, scenarios):
+        result = results[key]
+        output.append(dict(result, scenario=scenario, key=key,
+                           cumulative={name: np.cumsum(values) for name, values in result['per_cycle'].items()}))
+    report = {'scenarios': len(scenarios), 'computed': len(missing), 'cached': len(results) - len(missing),
+              'evicted': evicted, 'cache_bytes': cache.size(), 'seconds': tm.perf_counter() - start_time}
+    return output, report
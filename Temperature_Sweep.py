@@ -0,0 +1,41 @@
+import numpy as np
+from Cycle_Engine import CycleProfile
+
+
+# Evaluates a whole temperature sweep as one (temperature x sample) array computation instead of
+# one cycle loop per temperature. temperatures (K) and current_scales broadcast against each other
+# and give one row each; a current scale multiplies the charging (positive) current only, on the
+# same time base. Returns a structured array with one row per temperature holding the per-cycle
+# ('Q_cal', ...) and cumulative ('Q_cal_cumulative', ...) loss breakdown.
+def sweep_temperatures(base_time, current, SOC, temperatures, num_cycles, current_scales=None, profiler=None, **options):
+    base_time = np.asarray(base_time, dtype=float)
+    current = np.asarray(current, dtype=float)
+    temperatures = np.atleast_1d(np.asarray(temperatures, dtype=float))
+    scales = np.ones_like(temperatures) if current_scales is None else np.asarray(current_scales, dtype=float)
+    temperatures, scales = np.broadcast_arrays(temperatures, np.atleast_1d(scales))
+
+    if np.all(scales == 1):
+        row_current = current
+    else:
+        row_current = np.where(current > 0, current * scales[:, None], current)
+
+    profile = CycleProfile(base_time, row_current, temperatures[:, None], SOC, profiler=profiler, **options)
+    if profiler is not None:
+        profiler.start()
+    per_cycle = profile.losses(np.arange(num_cycles))
+    if profiler is not None:
+        profiler.lap('integrate')
+        profiler.count(samples=num_cycles * profile.base_time.size, cycles=num_cycles * len(temperatures))
+
+    dtype = [('temperature', float), ('current_scale', float)]
+    dtype += [(key, float, (num_cycles,)) for key in per_cycle]
+    dtype += [(key + '_cumulative', float, (num_cycles,)) for key in per_cycle]
+    result = np.zeros(len(temperatures), dtype=dtype)
+    result['temperature'] = temperatures
+    result['current_scale'] = scales
+    for key, values in per_cycle.items():
+        result[key] = values
+        result[key + '_cumulative'] = np.cumsum(values, axis=-1)
+    if profiler is not None:
+        profiler.lap('bookkeeping')
+    return result
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# The modules live flat in the repository root and import each other by name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def crdr_profile():
+    # One CRDR-like cycle (h, A, %): 1.5 A charge, a taper, 1 h rest, 1.5 A discharge, 1 h rest
+    seconds_step = 60.0
+    current = np.concatenate([np.full(55, 1.5), 1.5 * np.exp(-np.arange(30) * seconds_step / 400), [0.0],
+                              np.full(58, -1.5), [0.0]])
+    steps = np.full(len(current), seconds_step)
+    steps[85] = steps[-1] = 3600
+    seconds = np.concatenate([[0], np.cumsum(steps[:-1])])
+    charge = np.concatenate([[0], np.cumsum(current[:-1] * np.diff(seconds))]) / 3600
+    SOC = np.clip(charge / 1.54 * 100, 0, 100)
+    return seconds / 3600, current, SOC
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from Calc_SOC import C0_As, CoulombCounter, clamped_cumsum
+
+
+def _sequential(initial_SOC, increments, direction):
+    # the original row-by-row clamping loop of Calc_SOC.calculate_SOC
+    SOC = []
+    value = initial_SOC
+    for increment in increments:
+        value = value + increment
+        if direction == 'charge' and value > 99:
+            value = 100
+        elif direction == 'discharge' and value < 1:
+            value = 0
+        SOC.append(value)
+    return np.array(SOC)
+
+
+def _walk(rng, direction, size):
+    # drifts into the clamp, with steps around the escape bound (-1 / +1) and exact -1 / +1 steps
+    drift = 0.8 if direction == 'charge' else -0.8
+    increments = rng.normal(drift, 2.0, size)
+    boundary = rng.random(size) < 0.1
+    increments[boundary] = rng.choice([-1.0, 1.0, -1.0000001, 1.0000001, -0.9999999, 0.9999999], boundary.sum())
+    return increments
+
+
+@pytest.mark.parametrize('direction', ['charge', 'discharge'])
+@pytest.mark.parametrize('seed', range(20))
+def test_clamped_cumsum_matches_the_sequential_loop(direction, seed):
+    rng = np.random.default_rng(seed)
+    initial_SOC = rng.uniform(0, 100)
+    increments = _walk(rng, direction, int(rng.integers(300, 2000)))
+    expected = _sequential(initial_SOC, increments, direction)
+    assert np.any(expected == (100 if direction == 'charge' else 0))
+    np.testing.assert_array_equal(clamped_cumsum(initial_SOC, increments, direction), expected)
+
+
+@pytest.mark.parametrize('direction', ['charge', 'discharge'])
+def test_clamped_cumsum_edge_cases(direction):
+    assert clamped_cumsum(50.0, [], direction).shape == (0,)
+    for initial_SOC in (0.0, 100.0, 99.0, 1.0):
+        increments = np.array([0.0, 1.0, -1.0, 0.5, -0.5, 2.0, -2.0])
+        np.testing.assert_array_equal(clamped_cumsum(initial_SOC, increments, direction),
+                                      _sequential(initial_SOC, increments, direction))
+
+
+@pytest.mark.parametrize('direction', ['charge', 'discharge'])
+def test_chunked_coulomb_counting_matches_one_call(direction):
+    rng = np.random.default_rng(7)
+    time_seconds = np.cumsum(rng.uniform(0.5, 30, 5000))
+    sign = 1 if direction == 'charge' else -1
+    current_mA = sign * rng.uniform(-500, 3000, len(time_seconds))
+    initial_SOC = 20.0 if direction == 'charge' else 80.0
+
+    whole = CoulombCounter(initial_SOC, direction).update(time_seconds, current_mA)
+    # the original per-row formulation: the previous row's current over the time step
+    increments = current_mA[:-1] / 1000 * np.diff(time_seconds) / C0_As * 100
+    np.testing.assert_array_equal(whole, np.concatenate([[initial_SOC], _sequential(initial_SOC, increments, direction)]))
+
+    counter = CoulombCounter(initial_SOC, direction)
+    # random chunk bounds plus a one-row chunk [100, 101)
+    bounds = np.unique(np.concatenate([rng.choice(np.arange(1, len(time_seconds)), 30, replace=False), [100, 101]]))
+    chunks = [counter.update(time_seconds[start:stop], current_mA[start:stop])
+              for start, stop in zip(np.concatenate([[0], bounds]), np.concatenate([bounds, [len(time_seconds)]]))]
+    # an empty chunk changes nothing
+    chunks.append(counter.update(np.empty(0), np.empty(0)))
+    np.testing.assert_array_equal(np.concatenate(chunks), whole)
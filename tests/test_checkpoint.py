@@ -0,0 +1,123 @@
+from functools import partial
+
+import numpy as np
+import pytest
+
+from Aging_Model import k_all, parameter_overrides
+from Checkpoint import Checkpointer, rate_function_key
+from Closed_Loop import run_closed_loop
+from Cycle_Engine import run_cycles
+
+TEMPERATURE = 273.15
+
+
+class Interrupted(Exception):
+    pass
+
+
+class InterruptAt:
+    # progress stand-in that stops the run after the given cycle, like a killed process
+    def __init__(self, cycle):
+        self.cycle = cycle
+
+    def update(self, cycles_done, **values):
+        if cycles_done == self.cycle:
+            raise Interrupted
+
+
+def _loop(profile, num_cycles, **options):
+    time, current, SOC = profile
+    return run_cycles(time, current, np.full(len(time), TEMPERATURE), SOC, num_cycles, **options)
+
+
+def _closed_loop(profile, num_cycles, **options):
+    time, current, SOC = profile
+    return run_closed_loop(time, current, TEMPERATURE, SOC, num_cycles, **options)
+
+
+def _assert_identical(result, expected, num_cycles):
+    for key, values in expected['per_cycle'].items():
+        np.testing.assert_array_equal(result['per_cycle'][key][:num_cycles], values[:num_cycles])
+    for name in ('final_time', 'final_phi_ch', 'final_phi_total'):
+        assert result[name] == expected[name]
+
+
+@pytest.mark.parametrize('engine', [_loop, _closed_loop])
+def test_interrupted_run_resumes_bit_identically(engine, crdr_profile, tmp_path):
+    expected = engine(crdr_profile, 12, keep_every=5)
+    path = str(tmp_path / 'state.npz')
+    with pytest.raises(Interrupted):
+        engine(crdr_profile, 12, keep_every=5, progress=InterruptAt(8), checkpoint=Checkpointer(path, every_cycles=3))
+    checkpoint = Checkpointer(path, every_cycles=3)
+    result = engine(crdr_profile, 12, keep_every=5, checkpoint=checkpoint)
+    # cycles 1-6 come from the checkpoint, 7-12 are recomputed
+    assert checkpoint.saves == 2
+    _assert_identical(result, expected, 12)
+    assert sorted(result['trajectories']) == [0, 5, 10]
+    np.testing.assert_array_equal(result['trajectories'][5]['phi_total'], expected['trajectories'][5]['phi_total'])
+
+
+@pytest.mark.parametrize('engine', [_loop, _closed_loop])
+def test_fewer_cycles_than_the_checkpoint_return_its_first_cycles(engine, crdr_profile, tmp_path):
+    path = str(tmp_path / 'state.npz')
+    engine(crdr_profile, 10, keep_every=4, checkpoint=Checkpointer(path, every_cycles=5))
+    checkpoint = Checkpointer(path, every_cycles=5)
+    result = engine(crdr_profile, 6, keep_every=4, checkpoint=checkpoint)
+    expected = engine(crdr_profile, 6, keep_every=4)
+    assert checkpoint.saves == 0
+    _assert_identical(result, expected, 6)
+    assert len(result['per_cycle']['Q_total']) == 6
+    assert result.get('completed_cycles', 6) == 6
+    assert sorted(result['trajectories']) == [0, 4]
+    # the longer run's checkpoint is kept and extends as before
+    _assert_identical(engine(crdr_profile, 10, keep_every=4, checkpoint=Checkpointer(path)),
+                      engine(crdr_profile, 10, keep_every=4), 10)
+
+
+@pytest.mark.parametrize('engine', [_loop, _closed_loop])
+@pytest.mark.parametrize('change', ['input', 'parameter', 'override', 'integrator'])
+def test_changed_run_invalidates_the_checkpoint(engine, change, crdr_profile, tmp_path):
+    path = str(tmp_path / 'state.npz')
+    engine(crdr_profile, 3, checkpoint=Checkpointer(path))
+    time, current, SOC = crdr_profile
+    options = {}
+    if change == 'input':
+        crdr_profile = (time, current * 0.9, SOC)
+    elif change == 'parameter':
+        options['rate_function'] = partial(k_all, params={'Ea_Cal': 3e4})
+    elif change == 'integrator':
+        options['integrator'] = 'product'
+    with pytest.raises(ValueError, match='different run'):
+        if change == 'override':
+            with parameter_overrides(Ea_Cal=3e4):
+                engine(crdr_profile, 3, checkpoint=Checkpointer(path))
+        else:
+            engine(crdr_profile, 3, checkpoint=Checkpointer(path), **options)
+
+
+def test_rate_function_key_names_the_parameters_in_effect():
+    assert rate_function_key(partial(k_all, params={'Ea_Cal': 3e4})) != rate_function_key(partial(k_all, params={'Ea_Cal': 1e4}))
+    # the same parameter values give the same key, however they are set
+    assert rate_function_key(partial(k_all, params={'Ea_Cal': 2.1e4})) == rate_function_key(partial(k_all, params={'Ea_Cal': 21000}))
+    with parameter_overrides(Ea_Cal=2.1e4):
+        assert rate_function_key(k_all) == rate_function_key(partial(k_all, params={'Ea_Cal': 2.1e4}))
+    with pytest.raises(ValueError, match='Cannot identify'):
+        rate_function_key(lambda T, I_Ch, SOC: k_all(T, I_Ch, SOC))
+
+
+def test_interrupted_save_keeps_the_previous_checkpoint(tmp_path, monkeypatch):
+    checkpoint = Checkpointer(str(tmp_path / 'state.npz'))
+    checkpoint.save('run', {'cycle': np.array(3), 'values': np.arange(3.0)})
+
+    def dies_mid_write(file, **arrays):
+        file.write(b'PK\x03\x04 partial')
+        raise Interrupted
+
+    monkeypatch.setattr(np, 'savez', dies_mid_write)
+    with pytest.raises(Interrupted):
+        checkpoint.save('run', {'cycle': np.array(6), 'values': np.arange(6.0)})
+    monkeypatch.undo()
+
+    state = Checkpointer(str(tmp_path / 'state.npz')).load('run')
+    assert int(state['cycle']) == 3
+    np.testing.assert_array_equal(state['values'], np.arange(3.0))
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from Calc_SOC import C0_Ah
+from Closed_Loop import run_closed_loop
+
+
+@pytest.mark.parametrize('stop_retention', [0.05, 0.9])
+def test_run_stops_at_the_retention_limit(stop_retention, crdr_profile):
+    time, current, SOC = crdr_profile
+    result = run_closed_loop(time, current, 273.15, SOC, 300, stop_retention=stop_retention)
+    completed = result['completed_cycles']
+    assert 0 < completed < 300
+    retention = 1 - np.cumsum(result['per_cycle']['Q_total'][:completed])
+    # every cycle started above the limit with a positive capacity, the last one crossed it
+    assert np.all(np.concatenate([[1], retention[:-1]]) > stop_retention)
+    assert retention[-1] <= stop_retention
+    assert retention[-1] > 0
+    np.testing.assert_allclose(result['capacity'][:completed], C0_Ah * np.concatenate([[1], retention[:-1]]), rtol=1e-12)
+    for name in ('capacity', 'SOC_min'):
+        assert np.all(np.isnan(result[name][completed:]))
+    assert np.all(np.isnan(result['per_cycle']['Q_total'][completed:]))
+
+
+def test_default_limit_keeps_the_capacity_physical(crdr_profile):
+    time, current, SOC = crdr_profile
+    result = run_closed_loop(time, current, 273.15, SOC, 300)
+    completed = result['completed_cycles']
+    assert completed < 300
+    assert np.all(result['capacity'][:completed] > 0)
+    assert 0 < 1 - np.sum(result['per_cycle']['Q_total'][:completed]) <= 0.05
+    # a mild temperature runs every cycle
+    assert run_closed_loop(time, current, 298.15, SOC, 50)['completed_cycles'] == 50
+
+
+@pytest.mark.parametrize('stop_retention', [0.0, -0.1, 1.0])
+def test_non_physical_limit_is_rejected(stop_retention, crdr_profile):
+    time, current, SOC = crdr_profile
+    with pytest.raises(ValueError, match='stop_retention'):
+        run_closed_loop(time, current, 273.15, SOC, 10, stop_retention=stop_retention)
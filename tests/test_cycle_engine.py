@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from Cycle_Engine import INTEGRATORS, CycleProfile, fast_forward, run_cycles
+
+# documented agreement of fast_forward / CycleProfile with the CycleData loop, relative per cycle
+TOLERANCE = 1e-10
+NUM_CYCLES = 1500
+
+
+@pytest.mark.parametrize('integrator', INTEGRATORS)
+@pytest.mark.parametrize('temperature', [273.15, 318.15])
+def test_fast_forward_matches_the_cycle_loop(integrator, temperature, crdr_profile):
+    time, current, SOC = crdr_profile
+    loop = run_cycles(time, current, np.full(len(time), temperature), SOC, NUM_CYCLES, integrator)
+    forward = fast_forward(time, current, temperature, SOC, NUM_CYCLES, integrator=integrator)
+    for key, values in loop['per_cycle'].items():
+        np.testing.assert_allclose(forward['per_cycle'][key], values, rtol=TOLERANCE, err_msg=key)
+    for name in ('final_time', 'final_phi_ch', 'final_phi_total'):
+        assert forward[name] == pytest.approx(loop[name], rel=1e-12)
+
+    # cumulative_losses sums the cycles past the first 32 by Euler-Maclaurin
+    profile = CycleProfile(time, current, temperature, SOC, integrator=integrator)
+    counts = np.array([1, 2, 31, 32, 33, 100, 999, NUM_CYCLES])
+    cumulative = profile.cumulative_losses(counts)
+    for key, values in loop['cumulative'].items():
+        np.testing.assert_allclose(cumulative[key], values[counts - 1], rtol=TOLERANCE, err_msg=key)
+
+
+@pytest.mark.parametrize('zero_denominator', [1e-1, 1e-3])
+def test_zero_denominator_reaches_the_cycle_loop(zero_denominator, crdr_profile):
+    time, current, SOC = crdr_profile
+    loop = run_cycles(time, current, np.full(len(time), 298.15), SOC, 5, zero_denominator=zero_denominator)
+    forward = fast_forward(time, current, 298.15, SOC, 5, zero_denominator=zero_denominator)
+    for key, values in loop['per_cycle'].items():
+        np.testing.assert_allclose(forward['per_cycle'][key], values, rtol=TOLERANCE, err_msg=key)
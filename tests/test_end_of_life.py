@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from Cycle_Engine import CycleProfile, run_cycles
+from End_Of_Life import cycles_to_threshold
+
+TEMPERATURES = np.array([273.15, 298.15, 318.15])
+THRESHOLD = 0.97
+
+
+def _crossing_cycles(profile, num_cycles=400):
+    # brute force: the 1-based cycle in which the accumulated loss first reaches 1 - THRESHOLD
+    time, current, SOC = profile
+    cycles = []
+    for temperature in TEMPERATURES:
+        cumulative = run_cycles(time, current, np.full(len(time), temperature), SOC, num_cycles)['cumulative']['Q_total']
+        assert cumulative[-1] >= 1 - THRESHOLD
+        cycles.append(int(np.argmax(cumulative >= 1 - THRESHOLD)) + 1)
+    return np.array(cycles)
+
+
+def test_matches_brute_force_cycling(crdr_profile):
+    expected = _crossing_cycles(crdr_profile)
+    cycles = cycles_to_threshold(crdr_profile, TEMPERATURES, threshold=THRESHOLD)
+    assert cycles.shape == TEMPERATURES.shape
+    # the crossing lies inside the brute-force cycle: after its start, at most at its end
+    assert np.all(cycles > expected - 1)
+    assert np.all(cycles <= expected)
+
+
+def test_threshold_not_reached_is_inf(crdr_profile):
+    cycles = cycles_to_threshold(crdr_profile, TEMPERATURES, threshold=0.5, max_cycles=10 ** 4)
+    assert np.isfinite(cycles[0])
+    assert np.all(np.isinf(cycles[1:]))
+
+
+def test_max_cycles_clamps_the_search(crdr_profile):
+    expected = _crossing_cycles(crdr_profile)
+    # a limit at the crossing cycle still finds it, one cycle less does not (neither is a power of two,
+    # so the doubling bracket is cut at the limit)
+    found = cycles_to_threshold(crdr_profile, TEMPERATURES, threshold=THRESHOLD, max_cycles=int(expected.max()))
+    assert np.all(np.isfinite(found))
+    np.testing.assert_array_equal(np.floor(found), expected - 1)
+    clamped = cycles_to_threshold(crdr_profile, TEMPERATURES, threshold=THRESHOLD, max_cycles=int(expected.max()) - 1)
+    np.testing.assert_array_equal(np.isinf(clamped), expected == expected.max())
+    np.testing.assert_array_equal(clamped[expected < expected.max()], found[expected < expected.max()])
+
+
+@pytest.mark.parametrize('integrator', ['trapz', 'product'])
+def test_prebuilt_cycle_profile(integrator, crdr_profile):
+    time, current, SOC = crdr_profile
+    profile = CycleProfile(time, current, TEMPERATURES[:, None], SOC, integrator=integrator)
+    np.testing.assert_array_equal(cycles_to_threshold(profile, None, threshold=THRESHOLD),
+                                  cycles_to_threshold(crdr_profile, TEMPERATURES, threshold=THRESHOLD, integrator=integrator))
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from Calc_SOC import build_CRDR, initial_SOC_from_rest
+from OCV_Table import OCVTable, load_table
+
+
+def _ocv(SOC):
+    return 3.0 + 0.004 * SOC
+
+
+def _write_ocv_test(path):
+    # charge then discharge, columns laid out like the OCV test export (voltage 3rd, SOC 4th)
+    SOC = np.concatenate([np.linspace(0, 100, 101), np.linspace(100, 0, 101)])
+    voltage = _ocv(SOC) + np.where(np.arange(len(SOC)) < 101, 0.01, -0.01)
+    with open(path, 'w') as file:
+        file.write('Index,Time,Voltage(V),SOC\n')
+        for index, (value, soc) in enumerate(zip(voltage, SOC)):
+            file.write(f'{index},{index},{float(value)!r},{float(soc)!r}\n')
+
+
+def _write_cycler(path, rest_voltage, current_mA):
+    with open(path, 'w') as file:
+        file.write('Relative Time(h:min:s.ms),Current(mA),Voltage(V),Scaled Voltage(V)\n')
+        file.write(f'0:00:00.000,0,{float(rest_voltage)!r},2.7\n')
+        for second in range(1, 11):
+            file.write(f'0:00:{second:02d}.000,{current_mA},{float(rest_voltage) + 0.001 * second!r},2.8\n')
+
+
+def test_table_round_trips_and_keeps_its_cycler_column(tmp_path):
+    csv_path = str(tmp_path / 'ocv.csv')
+    _write_ocv_test(csv_path)
+    table = load_table(csv_path)
+    assert table.has_hysteresis
+    np.testing.assert_allclose(table.ocv(50.0), _ocv(50.0), atol=1e-9)
+    np.testing.assert_allclose(table.soc(_ocv(30.0)), 30.0, atol=1e-6)
+
+    reloaded = OCVTable.load(csv_path + '.ocv.npz')
+    assert reloaded.cycler_column == 'Voltage(V)'
+    np.testing.assert_array_equal(reloaded.branches['mean'], table.branches['mean'])
+
+
+def test_initial_SOC_reads_the_raw_voltage(tmp_path):
+    table = OCVTable(np.linspace(0, 100, 101), {'mean': _ocv(np.linspace(0, 100, 101))})
+    cycler_path = str(tmp_path / 'chg.csv')
+    _write_cycler(cycler_path, _ocv(40.0), 1500)
+    assert initial_SOC_from_rest(cycler_path, table) == pytest.approx(40.0)
+    # the rescaled column is on another scale and must not be clamped into the table
+    with pytest.raises(ValueError, match='same voltage scale'):
+        initial_SOC_from_rest(cycler_path, table, voltage_column='Scaled Voltage(V)')
+
+
+def test_build_CRDR_needs_a_table_for_rest_initialisation(tmp_path):
+    chg_path = str(tmp_path / 'chg.csv')
+    _write_cycler(chg_path, 3.1, 1500)
+    save_path = tmp_path / 'CRDR.csv'
+    with pytest.raises(ValueError, match='ocv_table'):
+        build_CRDR(chg_path, chg_path, str(save_path), initial_chg_SOC=None)
+    assert not save_path.exists()
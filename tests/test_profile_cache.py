@@ -0,0 +1,35 @@
+import os
+
+import numpy as np
+import pytest
+
+from Profile_Cache import cache_dir_for, load_profile
+
+
+def _write_profile(path, rows=50):
+    seconds = np.arange(rows, dtype=float) * 10
+    current = np.where(np.arange(rows) < rows // 2, 1500.0, -1500.0)
+    SOC = np.linspace(0, 100, rows)
+    with open(path, 'w') as file:
+        file.write('Time (seconds),Current(mA),Scaled Voltage(V),SOC\n')
+        for values in zip(seconds, current, np.full(rows, 3.3), SOC):
+            file.write(','.join(repr(float(value)) for value in values) + '\n')
+    return seconds, current, SOC
+
+
+def test_missing_csv_raises_without_creating_a_sidecar(tmp_path):
+    csv_path = str(tmp_path / 'missing.csv')
+    with pytest.raises(FileNotFoundError):
+        load_profile(csv_path)
+    assert not os.path.exists(cache_dir_for(csv_path))
+    assert os.listdir(tmp_path) == []
+
+
+def test_profile_is_converted_to_hours_and_amperes(tmp_path):
+    csv_path = str(tmp_path / 'CRDR.csv')
+    seconds, current, SOC = _write_profile(csv_path)
+    time, current_A, SOC_loaded = load_profile(csv_path)
+    np.testing.assert_allclose(time, seconds / 3600)
+    np.testing.assert_allclose(current_A, current / 1000)
+    np.testing.assert_allclose(SOC_loaded, SOC)
+    assert os.path.isdir(cache_dir_for(csv_path))
@@ -0,0 +1,87 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from Result_Export import LOSS_COLUMNS, LossExporter, read_columns, scenarios
+
+# format -> (path suffix, module the backend needs)
+FORMATS = {'columns': ('losses', None), 'parquet': ('losses.parquet', 'pyarrow'), 'hdf5': ('losses.h5', 'h5py')}
+
+
+def _per_cycle(cycles, scale):
+    rng = np.random.default_rng(cycles)
+    losses = {name: rng.uniform(0, 1e-5, cycles) * scale for name in LOSS_COLUMNS if name != 'Q_total'}
+    losses['Q_total'] = losses['Q_cal'] + losses['Q_cycle1'] + losses['Q_cycle2'] + losses['Q_cycle3']
+    return losses
+
+
+@pytest.fixture(params=list(FORMATS))
+def export_path(request, tmp_path):
+    suffix, module = FORMATS[request.param]
+    if module:
+        pytest.importorskip(module)
+    return str(tmp_path / suffix)
+
+
+def test_round_trip_across_sessions(export_path):
+    first, second = _per_cycle(700, 1.0), _per_cycle(300, 2.0)
+    # a small buffer so the rows are written in several batches
+    with LossExporter(export_path, buffer_rows=256) as exporter:
+        exporter.append('CRDR', 298.15, first)
+        exporter.append('UDDS', 273.15, second)
+    # a second session appends to the same store and continues the scenario's running total
+    with LossExporter(export_path, buffer_rows=256) as exporter:
+        exporter.append('CRDR', 298.15, second, first_cycle=701, initial_total=float(np.sum(first['Q_total'])))
+
+    assert scenarios(export_path) == {'CRDR': 0, 'UDDS': 1}
+    crdr = read_columns(export_path, ['cycle', 'temperature', 'Q_total', 'Q_total_cumulative'], scenario='CRDR')
+    np.testing.assert_array_equal(crdr['cycle'], np.arange(1, 1001))
+    np.testing.assert_array_equal(crdr['temperature'], 298.15)
+    expected = np.concatenate([first['Q_total'], second['Q_total']])
+    np.testing.assert_array_equal(crdr['Q_total'], expected)
+    np.testing.assert_allclose(crdr['Q_total_cumulative'], np.cumsum(expected), rtol=1e-12)
+
+    udds = read_columns(export_path, scenario='UDDS')
+    assert udds['scenario'].dtype == np.int32
+    for name in LOSS_COLUMNS:
+        np.testing.assert_array_equal(udds[name], second[name])
+    assert len(read_columns(export_path, ['cycle'])['cycle']) == 1300
+
+
+def test_column_files_are_little_endian(tmp_path):
+    path = str(tmp_path / 'losses')
+    per_cycle = _per_cycle(100, 1.0)
+    with LossExporter(path) as exporter:
+        exporter.append('CRDR', 298.15, per_cycle)
+    with open(os.path.join(path, 'meta.json')) as file:
+        columns = json.load(file)['columns']
+    assert columns['cycle'] == '<i8' and columns['scenario'] == '<i4' and columns['Q_total'] == '<f8'
+    np.testing.assert_array_equal(np.fromfile(os.path.join(path, 'cycle.bin'), dtype='<i8'), np.arange(1, 101))
+    np.testing.assert_array_equal(np.fromfile(os.path.join(path, 'Q_total.bin'), dtype='<f8'), per_cycle['Q_total'])
+
+
+def test_column_files_are_read_with_the_recorded_dtypes(tmp_path):
+    # a directory written big-endian (e.g. on another machine) is read, and appended to, in its byte order
+    path = str(tmp_path / 'losses')
+    first, second = _per_cycle(50, 1.0), _per_cycle(30, 2.0)
+    with LossExporter(path) as exporter:
+        exporter.append('CRDR', 298.15, first)
+    meta_path = os.path.join(path, 'meta.json')
+    with open(meta_path) as file:
+        meta = json.load(file)
+    for name, dtype in meta['columns'].items():
+        column_path = os.path.join(path, f'{name}.bin')
+        values = np.fromfile(column_path, dtype=dtype)
+        values.astype(np.dtype(dtype).newbyteorder('>')).tofile(column_path)
+        meta['columns'][name] = np.dtype(dtype).newbyteorder('>').str
+    with open(meta_path, 'w') as file:
+        json.dump(meta, file)
+
+    with LossExporter(path) as exporter:
+        exporter.append('CRDR', 298.15, second, first_cycle=51, initial_total=float(np.sum(first['Q_total'])))
+    crdr = read_columns(path, ['cycle', 'Q_total'], scenario='CRDR')
+    np.testing.assert_array_equal(crdr['cycle'], np.arange(1, 81))
+    np.testing.assert_array_equal(crdr['Q_total'], np.concatenate([first['Q_total'], second['Q_total']]))
+    np.testing.assert_array_equal(np.fromfile(os.path.join(path, 'cycle.bin'), dtype='>i8'), np.arange(1, 81))